@@ -0,0 +1,431 @@
+#
+# Benchmark suite
+# Times the hot paths of the game at increasing sizes (bodies, particles,
+# points...) and optionally writes the results to a JSON file, to compare
+# runs before and after optimisation work:
+#
+#   python benchmark/bench.py -o before.json
+#   python benchmark/bench.py -c before.json
+#
+
+import json
+import math
+import os
+import platform
+import sys
+from collections import namedtuple
+from optparse import OptionParser
+from time import time, strftime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    '..', 'starorbit'))
+
+import numpy as np
+
+import gloss
+import starorbit
+from starorbit import GVector, GVectorArray, HeadlessGame, ShipReflex, \
+    Sun, Tiles
+from integrators import get_integrator
+from physics import G
+from prediction import predict_chunks
+from units import CHECKED, degrees, degrees_per_sec, seconds, opposite, \
+    to_radians
+
+SIZES = (10, 100, 1000, 10000, 100000)
+
+# (name, function, sizes). Functions take a size and return
+# (setup, run): setup() is called before each timed run() and returns its
+# arguments
+BENCHMARKS = []
+
+_Texture = namedtuple('Texture', 'width height surface uv')
+_Texture.__new__.__defaults__ = (1, (0., 0., 1., 1.))
+
+
+def benchmark(name, sizes=SIZES):
+    """Register a benchmark"""
+    def register(f):
+        BENCHMARKS.append((name, f, sizes))
+        return f
+    return register
+
+
+def new_game(satellites=0):
+    """Create a headless game, used by the code relying on the global"""
+    gloss.Gloss.tick_count = 0
+    gloss.Gloss.elapsed_seconds = .016
+    starorbit.game = HeadlessGame(satellites=satellites)
+    starorbit.game.load_content()
+    return starorbit.game
+
+
+def random_gvectors(n, scale=1000.):
+    return [GVector(float(x), float(y))
+        for x, y in np.random.uniform(-scale, scale, (n, 2))]
+
+
+@benchmark('vector.add')
+def bench_vector_add(n):
+    vectors = random_gvectors(n)
+    d = GVector(.5, -.5)
+
+    def run():
+        for v in vectors:
+            v + d
+    return None, run
+
+
+@benchmark('vector.sub_mul')
+def bench_vector_sub_mul(n):
+    vectors = random_gvectors(n)
+    d = GVector(.5, -.5)
+
+    def run():
+        for v in vectors:
+            (v - d) * 2.
+    return None, run
+
+
+@benchmark('vector.iadd')
+def bench_vector_iadd(n):
+    d = GVector(.5, -.5)
+
+    def setup():
+        return (random_gvectors(n),)
+
+    def run(vectors):
+        for v in vectors:
+            v += d
+    return setup, run
+
+
+@benchmark('vector.create')
+def bench_vector_create(n):
+    coords = [(float(i), -float(i)) for i in xrange(n)]
+
+    def run():
+        for x, y in coords:
+            GVector(x, y)
+    return None, run
+
+
+@benchmark('vector.frame')
+def bench_vector_frame(n):
+    """Vector work for each of n bodies in a frame: gravity, move, screen
+    position
+    """
+    new_game()
+    sun = GVector(100, -100)
+
+    def setup():
+        return random_gvectors(n), random_gvectors(n, 1.)
+
+    def run(positions, speeds):
+        for pos, speed in zip(positions, speeds):
+            speed += (sun - pos) * .0001
+            pos += speed
+            pos.on_screen
+    return setup, run
+
+
+@benchmark('vector.modulo_angle')
+def bench_vector_modulo_angle(n):
+    vectors = random_gvectors(n)
+
+    def run():
+        for v in vectors:
+            v.modulo
+            v.angle
+    return None, run
+
+
+@benchmark('vector.normalized')
+def bench_vector_normalized(n):
+    vectors = random_gvectors(n)
+    center = GVector(100, -100)
+
+    def run():
+        for v in vectors:
+            v.distance(center)
+            v.normalized(center)
+    return None, run
+
+
+def reference_acceleration(center, mass, suns):
+    """Gravitational acceleration relative to the suns of one body, as the
+    game computed it before BodyStore: the baseline of bodies.step
+    """
+    acceleration_v = GVector(0, 0)
+    for sun in suns:
+        distance = center.distance(sun.gcenter)
+        dist_normal = center.normalized(sun.gcenter)
+        force = G * (mass * sun.mass) / (distance ** 2)
+        acceleration_v += dist_normal * force / mass
+    return acceleration_v
+
+
+@benchmark('satellite.calculate_acceleration')
+def bench_calculate_acceleration(n):
+    game = new_game(n)
+
+    def run():
+        for s in game._satellites:
+            reference_acceleration(s.gcenter, s.mass, game._suns)
+    return None, run
+
+
+@benchmark('bodies.step')
+def bench_bodies_step(n):
+    game = new_game(n)
+    sun_pos, sun_mass = game._sun_arrays()
+    # bodies crashing into the sun are not removed: start from the same state
+    pos, vel = game._bodies.pos.copy(), game._bodies.vel.copy()
+
+    def setup():
+        game._bodies.pos[:] = pos
+        game._bodies.vel[:] = vel
+
+    def run():
+        game._bodies.step(sun_pos, sun_mass)
+    return setup, run
+
+
+@benchmark('prediction.predict_chunks')
+def bench_predict_chunks(n):
+    sun_pos = np.array([[100., -100.]])
+    sun_mass = np.array([4.])
+
+    def run():
+        # every step produces a point, the orbit never closes
+        next(predict_chunks((-100, 100), (.15, .15), sun_pos, sun_mass,
+            get_integrator('leapfrog'), steps=n, spacing=0, closing=0,
+            max_points=n + 1))
+    return None, run
+
+
+@benchmark('particles.update')
+def bench_particles_update(n):
+    new_game()
+
+    def setup():
+        return (gloss.ParticleSystem(None, initialparticles=n,
+            particlelifespan=10 ** 9, drag=.5, wind=(1, 1)),)
+
+    def run(system):
+        system.update()
+    return setup, run
+
+
+@benchmark('particles.draw')
+def bench_particles_draw(n):
+    """CPU side of drawing a particle system into a sprite batch"""
+    new_game()
+    system = gloss.ParticleSystem(_Texture(32, 32), initialparticles=n,
+        particlelifespan=10 ** 9, growth=.8)
+    system.update()
+
+    def run():
+        batch = gloss.SpriteBatch()
+        gloss.Gloss.batch = batch
+        system.draw()
+        gloss.Gloss.batch = None
+        for key in batch.order:
+            gloss.SpriteBatch.build(batch.groups[key])
+    return None, run
+
+
+@benchmark('spritebatch.add_build')
+def bench_spritebatch(n):
+    """CPU side of batched drawing: collect n quads, build the arrays"""
+    texture = _Texture(64, 64)
+    color = gloss.Color(1, 1, 1, .5)
+    positions = np.random.uniform(0, 800, (n, 2)).tolist()
+
+    def run():
+        batch = gloss.SpriteBatch()
+        for p in positions:
+            batch.add(texture, p, 30., None, .5, color)
+        for key in batch.order:
+            gloss.SpriteBatch.build(batch.groups[key])
+    return None, run
+
+
+@benchmark('tiles.find_displayed_tiles')
+def bench_find_displayed_tiles(n):
+    game = new_game()
+    tiles = Tiles()
+    tiles._basetile.texture = _Texture(512, 512)
+    # zoom out until about n tiles are visible
+    w, h = game.resolution.tup
+    game.zoom = math.sqrt(w * h / float(n)) / 512
+
+    def setup():
+        tiles._tiles = {}
+
+    def run():
+        tiles._find_displayed_tiles()
+    return setup, run
+
+
+@benchmark('gvector.on_screen')
+def bench_on_screen(n):
+    new_game()
+    vectors = random_gvectors(n)
+
+    def run():
+        for v in vectors:
+            v.on_screen
+    return None, run
+
+
+@benchmark('units.arithmetic')
+def bench_units_arithmetic(n):
+    angle = degrees(10)
+    av = degrees_per_sec(.5)
+
+    def run():
+        a = angle
+        for i in xrange(n):
+            a += av * seconds(1)
+            to_radians(degrees(180) - a)
+            opposite(a)
+    return None, run
+
+
+@benchmark('units.ship_reflex')
+def bench_ship_reflex(n):
+    """Light reflex updates, n frames"""
+    game = new_game()
+    reflex = ShipReflex(game._ship, 1, 45)
+
+    def run():
+        for i in xrange(n):
+            game._ship._angle = degrees(i % 360)
+            reflex.update()
+    return None, run
+
+
+@benchmark('gvectorarray.on_screen')
+def bench_array_on_screen(n):
+    new_game()
+    vectors = GVectorArray(np.random.uniform(-1000, 1000, (n, 2)))
+
+    def run():
+        vectors.on_screen.tolist()
+    return None, run
+
+
+@benchmark('gvectorarray.normalized')
+def bench_array_normalized(n):
+    vectors = GVectorArray(np.random.uniform(-1000, 1000, (n, 2)))
+    center = GVector(100, -100)
+
+    def run():
+        vectors.distance(center)
+        vectors.normalized(center)
+    return None, run
+
+
+@benchmark('sprite.recenter_unmoved', sizes=(10, 100, 1000))
+def bench_recenter_unmoved(n):
+    """Sprites that did not move, with a still camera"""
+    new_game()
+    suns = [Sun(GVector(i, i)) for i in xrange(n)]
+
+    def run():
+        for sun in suns:
+            sun._recenter()
+    return None, run
+
+
+@benchmark('game.recenter_satellites')
+def bench_recenter_satellites(n):
+    game = new_game(n)
+
+    def run():
+        game._recenter_satellites()
+    return None, run
+
+
+def measure(f, size, repeat):
+    """Time a benchmark at the given size. Return the best and mean times"""
+    setup, run = f(size)
+    times = []
+    for i in xrange(repeat):
+        args = setup() if setup else None
+        t0 = time()
+        run(*args or ())
+        times.append(time() - t0)
+    return min(times), sum(times) / len(times)
+
+
+def run_benchmarks(sizes=None, repeat=3, pattern=None):
+    """Run the benchmarks, print and return the results"""
+    results = []
+    print "%-35s %8s %12s %12s" % ('benchmark', 'size', 'best (s)',
+        'per item (us)')
+    for name, f, default_sizes in BENCHMARKS:
+        if pattern and pattern not in name:
+            continue
+        for size in sizes or default_sizes:
+            np.random.seed(0)
+            best, mean = measure(f, size, repeat)
+            results.append(dict(name=name, size=size, repeat=repeat,
+                best=best, mean=mean, per_item=best / size))
+            print "%-35s %8d %12.6f %12.3f" % (name, size, best,
+                best / size * 1e6)
+            sys.stdout.flush()
+    return results
+
+
+def compare(results, reference):
+    """Print the speedup of the results against a previous run"""
+    before = dict(((r['name'], r['size']), r['best'])
+        for r in reference['results'])
+    print
+    print "%-35s %8s %12s %12s %8s" % ('benchmark', 'size', 'before (s)',
+        'after (s)', 'speedup')
+    for r in results:
+        old = before.get((r['name'], r['size']))
+        if old is None:
+            continue
+        print "%-35s %8d %12.6f %12.6f %7.2fx" % (r['name'], r['size'], old,
+            r['best'], old / r['best'] if r['best'] else float('inf'))
+
+
+def parse_args():
+    """Parse command-line options"""
+    parser = OptionParser()
+    parser.add_option("-o", "--output", dest="output",
+        help="write the results to a JSON file")
+    parser.add_option("-c", "--compare", dest="compare",
+        help="compare with the results of a previous run")
+    parser.add_option("-s", "--sizes", dest="sizes",
+        help="comma separated sizes, default: %s" %
+        ','.join(map(str, SIZES)))
+    parser.add_option("-r", "--repeat", dest="repeat", type="int",
+        help="timed runs per benchmark, the best is kept", default=3)
+    parser.add_option("-k", dest="pattern",
+        help="only run benchmarks whose name contains PATTERN")
+    opts, args = parser.parse_args()
+    if opts.sizes:
+        opts.sizes = [int(s) for s in opts.sizes.split(',')]
+    return opts
+
+
+def main():
+    opts = parse_args()
+    results = run_benchmarks(opts.sizes, opts.repeat, opts.pattern)
+    if opts.output:
+        with open(opts.output, 'w') as f:
+            json.dump(dict(date=strftime('%Y-%m-%d %H:%M:%S'),
+                python=platform.python_version(), checked_units=CHECKED,
+                machine=platform.machine(), results=results), f, indent=1)
+    if opts.compare:
+        with open(opts.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#
+# Asset bundle
+# Textures and sounds decoded once by a build step and stored, ready to be
+# uploaded, in a single file. At runtime the file is memory-mapped: texture
+# data goes to GL and PCM data to the mixer without any decoding.
+#
+# File layout: MAGIC, version and index length (little endian uint32), the
+# JSON index, then the data blocks, each aligned to ALIGN bytes. The index
+# gives the offset and size of every block.
+#
+
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+import pygame
+
+import gloss
+
+MAGIC = 'SOBUNDLE'
+VERSION = 2
+ALIGN = 16
+_HEADER = struct.Struct('<8sII')
+
+
+def _source_stamp(path):
+    """Size and modification time of a source file"""
+    st = os.stat(path)
+    return [st.st_size, int(st.st_mtime)]
+
+
+class _Writer(object):
+    """Collect data blocks and their index entries"""
+    def __init__(self):
+        self.blocks = []
+        self.size = 0
+
+    def add(self, data):
+        """Queue a block of data, return its [offset, size] relative to the
+        start of the data section
+        """
+        offset = self.size
+        pad = -len(data) % ALIGN
+        self.blocks.append(data)
+        self.blocks.append('\0' * pad)
+        self.size += len(data) + pad
+        return [offset, len(data)]
+
+
+def build_bundle(path, atlas_files=(), textures=(), images=(), sounds=(),
+        lod_files=(), max_texture_size=4096):
+    """Decode the assets and write them to a bundle file:
+    atlas_files are packed in a gloss.TextureAtlas, with the levels of
+    detail of the ones in lod_files, textures are stored as
+    padded gloss.Texture data, images as plain RGB surfaces, sounds as PCM
+    samples in the format of the initialized mixer.
+    Missing source files are skipped, the game loads them at runtime.
+    Return the names of the missing files.
+    """
+    writer = _Writer()
+    index = dict(sources={}, atlas=None, textures={}, images={}, sounds={},
+        mixer=None)
+    missing = []
+
+    def available(fname):
+        if not os.path.exists(fname):
+            missing.append(fname)
+            return False
+        index['sources'][fname] = _source_stamp(fname)
+        return True
+
+    atlas_files = [f for f in atlas_files if available(f)]
+    if atlas_files:
+        pages, regions = gloss.TextureAtlas.render(atlas_files, 1,
+            max_texture_size, [f for f in lod_files if f in atlas_files])
+        index['atlas'] = dict(
+            pages=[[w, h] + writer.add(data) for w, h, data in pages],
+            regions=regions,
+        )
+
+    for fname in textures:
+        if available(fname):
+            data, w, h, po2w, po2h = gloss.Texture.prepare(
+                pygame.image.load(fname))
+            index['textures'][fname] = [w, h, po2w, po2h] + writer.add(data)
+
+    for fname in images:
+        if available(fname):
+            surface = pygame.image.load(fname)
+            index['images'][fname] = list(surface.get_size()) + \
+                writer.add(pygame.image.tostring(surface, 'RGB'))
+
+    if sounds:
+        index['mixer'] = pygame.mixer.get_init()
+    for fname in sounds:
+        if available(fname):
+            index['sounds'][fname] = writer.add(
+                pygame.mixer.Sound(fname).get_raw())
+
+    header = json.dumps(index)
+    start = _HEADER.size + len(header)
+    header += ' ' * (-start % ALIGN)
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for block in writer.blocks:
+            f.write(block)
+    return missing
+
+
+class AssetBundle(object):
+    """A memory-mapped bundle written by build_bundle"""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a version %d asset bundle" %
+                (path, VERSION))
+        self._index = json.loads(self._map[_HEADER.size:
+            _HEADER.size + length])
+        self._data_start = _HEADER.size + length
+        self.sources = self._index['sources']
+
+    def _block(self, offset, size):
+        """A block of data, as a read only array over the mapped file"""
+        return np.frombuffer(self._map, np.uint8, size,
+            self._data_start + offset)
+
+    def is_stale(self):
+        """Check if any source file changed since the bundle was built"""
+        for fname, stamp in self.sources.iteritems():
+            if not os.path.exists(fname) or _source_stamp(fname) != stamp:
+                return True
+        return False
+
+    def has_atlas(self):
+        return self._index['atlas'] is not None
+
+    def atlas(self):
+        """Upload the gloss.TextureAtlas, None if there is none"""
+        atlas = self._index['atlas']
+        if atlas is None:
+            return None
+        pages = [(w, h, self._block(offset, size))
+            for w, h, offset, size in atlas['pages']]
+        regions = dict((str(name), tuple(region))
+            for name, region in atlas['regions'].iteritems())
+        return gloss.TextureAtlas.from_data(pages, regions)
+
+    def has_texture(self, fname):
+        return fname in self._index['textures']
+
+    def texture(self, fname):
+        """Upload a gloss.Texture"""
+        w, h, po2w, po2h, offset, size = self._index['textures'][fname]
+        return gloss.Texture.from_data(self._block(offset, size), w, h,
+            po2w, po2h)
+
+    def has_image(self, fname):
+        return fname in self._index['images']
+
+    def image(self, fname):
+        """Return a pygame surface"""
+        w, h, offset, size = self._index['images'][fname]
+        return pygame.image.frombuffer(self._block(offset, size), (w, h),
+            'RGB')
+
+    def has_sound(self, fname):
+        """Check if a sound is in the bundle, in the mixer format"""
+        mixer = self._index['mixer']
+        return fname in self._index['sounds'] and mixer is not None and \
+            list(pygame.mixer.get_init() or ()) == mixer
+
+    def sound(self, fname):
+        """Return a pygame Sound, or None if the sound is not in the bundle
+        or its samples do not match the mixer format
+        """
+        if not self.has_sound(fname):
+            return None
+        return pygame.mixer.Sound(buffer=self._block(
+            *self._index['sounds'][fname]))
+
+
+def load_bundle(path):
+    """Open a bundle, return None if it does not exist or is out of date"""
+    if not os.path.exists(path):
+        return None
+    try:
+        bundle = AssetBundle(path)
+    except ValueError, e:
+        print "%s, loading the asset files" % e
+        return None
+    if bundle.is_stale():
+        print "%s is out of date, loading the asset files" % path
+        return None
+    return bundle
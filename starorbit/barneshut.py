@@ -0,0 +1,221 @@
+#
+# Barnes-Hut quadtree gravity solver
+# Mutual attraction between N bodies in O(N log N). Both tree construction and
+# traversal are vectorized with NumPy: the tree is built one level at a time
+# from Morton-sorted bodies, and it is walked by all bodies at once.
+#
+
+import numpy as np
+
+from physics import G, SunsGravity
+
+MAX_DEPTH = 16
+
+
+def _spread_bits(v):
+    """Interleave the lowest 16 bits of v with zeros"""
+    v = v & 0xffff
+    v = (v | (v << 8)) & 0x00ff00ff
+    v = (v | (v << 4)) & 0x0f0f0f0f
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+class QuadTree(object):
+    """Linear quadtree over a set of point masses.
+    Bodies are sorted by Morton key; every node covers a contiguous range
+    [start, end) of the sorted bodies. Node 0 is the root.
+    """
+    def __init__(self, pos, mass, max_depth=MAX_DEPTH):
+        assert max_depth <= 16, "Morton keys are limited to 16 levels"
+        n = len(pos)
+        lo = pos.min(axis=0)
+        side = max(float((pos.max(axis=0) - lo).max()), 1e-9)
+        cells = 1 << max_depth
+        ij = ((pos - lo) / side * (cells - 1)).astype(np.int64)
+        key = _spread_bits(ij[:, 0]) | (_spread_bits(ij[:, 1]) << 1)
+
+        self.order = np.argsort(key, kind='mergesort')
+        key = key[self.order]
+        self.pos = pos[self.order]
+        self.mass = mass[self.order]
+
+        starts, ends, masses, coms, sizes, leaves, children = \
+            [], [], [], [], [], [], []
+        idx = np.arange(n)  # sorted bodies still inside non-leaf nodes
+        offset = 0
+        for level in xrange(max_depth + 1):
+            lk = key[idx] >> (2 * (max_depth - level))
+            first = np.flatnonzero(np.r_[True, lk[1:] != lk[:-1]])
+            last = np.r_[first[1:], len(idx)] - 1
+            start = idx[first]
+            end = idx[last] + 1
+            m = np.add.reduceat(self.mass[idx], first)
+            mp = np.add.reduceat(self.pos[idx] * self.mass[idx, None], first)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                com = np.where(m[:, None] > 0, mp / m[:, None],
+                    self.pos[start])
+            leaf = (end - start == 1) | (level == max_depth)
+
+            if children:
+                # link the open nodes of the previous level to their children
+                p_start, p_end = children[-1]
+                children[-1] = (offset + np.searchsorted(start, p_start),
+                    offset + np.searchsorted(start, p_end))
+            offset += len(start)
+
+            starts.append(start)
+            ends.append(end)
+            masses.append(m)
+            coms.append(com)
+            sizes.append(np.full(len(start), side / (1 << level)))
+            leaves.append(leaf)
+            # placeholder: parent ranges, replaced on the next level
+            children.append((np.where(leaf, 0, start), np.where(leaf, 0, end)))
+
+            if leaf.all():
+                break
+            idx = idx[np.repeat(~leaf, end - start)]
+
+        # the last level has no children
+        children[-1] = (np.zeros(len(starts[-1]), dtype=np.int64), ) * 2
+        self.start = np.concatenate(starts)
+        self.end = np.concatenate(ends)
+        self.node_mass = np.concatenate(masses)
+        self.com = np.concatenate(coms)
+        self.size = np.concatenate(sizes)
+        self.leaf = np.concatenate(leaves)
+        self.child_start = np.concatenate([c[0] for c in children])
+        self.child_end = np.concatenate([c[1] for c in children])
+        # leaves have no children
+        self.child_end[self.leaf] = self.child_start[self.leaf]
+
+    def __len__(self):
+        """Number of nodes"""
+        return len(self.start)
+
+    def acceleration(self, theta=.5, softening=1.):
+        """Approximate acceleration of every body caused by all other bodies.
+        A node is approximated by its center of mass when
+        node size < theta * distance
+        """
+        n = len(self.pos)
+        ax = np.zeros(n)
+        ay = np.zeros(n)
+        theta2 = theta ** 2
+        eps2 = softening ** 2
+        bi = np.arange(n)
+        ni = np.zeros(n, dtype=np.int64)
+
+        while len(bi):
+            d = self.com[ni] - self.pos[bi]
+            r2 = (d * d).sum(axis=1)
+            inside = (self.start[ni] <= bi) & (bi < self.end[ni])
+            leaf = self.leaf[ni]
+            accept = leaf | (~inside & (self.size[ni] ** 2 < theta2 * r2))
+
+            b = bi[accept]
+            nodes = ni[accept]
+            d = d[accept]
+            r2 = r2[accept]
+            m = self.node_mass[nodes]
+
+            # remove the body own contribution from the leaf that holds it
+            own = inside[accept]
+            if own.any():
+                bo = b[own]
+                mo = self.mass[bo]
+                rest = m[own] - mo
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    com = (self.com[nodes[own]] * m[own, None] -
+                        self.pos[bo] * mo[:, None]) / rest[:, None]
+                d[own] = np.where(rest[:, None] > 0, com - self.pos[bo], 0)
+                r2[own] = (d[own] ** 2).sum(axis=1)
+                m[own] = np.maximum(rest, 0)
+
+            f = G * m / (r2 + eps2) ** 1.5
+            ax += np.bincount(b, weights=d[:, 0] * f, minlength=n)
+            ay += np.bincount(b, weights=d[:, 1] * f, minlength=n)
+
+            # open the remaining nodes
+            bi = bi[~accept]
+            ni = ni[~accept]
+            cnt = self.child_end[ni] - self.child_start[ni]
+            bi = np.repeat(bi, cnt)
+            first = np.repeat(self.child_start[ni] - (np.cumsum(cnt) - cnt),
+                cnt)
+            ni = first + np.arange(len(first))
+
+        acc = np.empty((n, 2))
+        acc[self.order, 0] = ax
+        acc[self.order, 1] = ay
+        return acc
+
+
+def barnes_hut_acceleration(pos, mass, theta=.5, softening=1.):
+    """Mutual gravitational acceleration of N bodies, O(N log N)
+    pos: (N, 2) array, mass: (N,) array
+    """
+    if len(pos) < 2:
+        return np.zeros_like(pos)
+    return QuadTree(pos, mass).acceleration(theta, softening)
+
+
+class BarnesHutGravity(SunsGravity):
+    """Gravity model: bodies are attracted by the suns and by each other.
+    theta is the opening angle: lower is more accurate and slower,
+    see compare()
+    """
+    def __init__(self, theta=.5, softening=1.):
+        self.theta = theta
+        self.softening = softening
+
+    def acceleration(self, pos, mass, sun_pos, sun_mass):
+        """Acceleration of each body"""
+        acc = SunsGravity.acceleration(self, pos, mass, sun_pos, sun_mass)
+        acc += barnes_hut_acceleration(pos, mass, self.theta, self.softening)
+        return acc
+
+
+def direct_acceleration(pos, mass, softening=1., chunk=1024):
+    """Mutual gravitational acceleration of N bodies by direct summation,
+    O(N ** 2). Used as the reference for the Barnes-Hut solver.
+    """
+    acc = np.empty_like(pos)
+    eps2 = softening ** 2
+    for i in xrange(0, len(pos), chunk):
+        d = pos[None, :, :] - pos[i:i + chunk, None, :]
+        r2 = (d * d).sum(axis=2)
+        f = G * mass[None, :] / (r2 + eps2) ** 1.5
+        # exclude self attraction
+        f[r2 == 0] = 0
+        acc[i:i + chunk] = (d * f[:, :, None]).sum(axis=1)
+    return acc
+
+
+def compare(n=2000, thetas=(.3, .5, .7, 1.), seed=0):
+    """Compare accuracy and speed against direct summation"""
+    from time import time
+    rnd = np.random.RandomState(seed)
+    pos = rnd.normal(scale=300, size=(n, 2))
+    mass = rnd.uniform(.001, .01, size=n)
+
+    t = time()
+    ref = direct_acceleration(pos, mass)
+    t_direct = time() - t
+    ref_mod = np.sqrt((ref ** 2).sum(axis=1))
+    print "%d bodies, direct summation: %.3fs" % (n, t_direct)
+    print "theta  time    speedup  median_err  p99_err"
+    for theta in thetas:
+        t = time()
+        acc = barnes_hut_acceleration(pos, mass, theta)
+        elapsed = time() - t
+        err = np.sqrt(((acc - ref) ** 2).sum(axis=1)) / ref_mod
+        print "%.2f   %.3fs  %6.1fx  %.2e    %.2e" % (theta, elapsed,
+            t_direct / elapsed, np.median(err), np.percentile(err, 99))
+
+
+if __name__ == '__main__':
+    import sys
+    compare(*map(int, sys.argv[1:2]))
@@ -0,0 +1,89 @@
+#
+# Camera
+# Holds zoom, camera target and screen center as a single affine
+# world-to-screen transform, recomputed only when one of them changes
+#
+
+import numpy as np
+
+
+class Camera(object):
+    """World (game units) to screen (pixels) transform:
+        screen = world * zoom + offset
+    where offset puts the camera target at the screen center.
+    version is bumped every time the transform changes, so that users can
+    tell whether positions they computed earlier are still valid.
+    """
+    def __init__(self, screen_center=(0, 0), zoom=1, target=(0, 0)):
+        self._screen_center = tuple(screen_center)
+        self._zoom = zoom
+        self._target = tuple(target)
+        self.version = 0
+        self._update()
+
+    def _update(self):
+        """Recompute the transform"""
+        z = self._zoom
+        self._ox = self._screen_center[0] - self._target[0] * z
+        self._oy = self._screen_center[1] - self._target[1] * z
+        self._offset = np.array((self._ox, self._oy))
+        self.version += 1
+
+    @property
+    def zoom(self):
+        return self._zoom
+
+    @zoom.setter
+    def zoom(self, zoom):
+        if zoom != self._zoom:
+            self._zoom = zoom
+            self._update()
+
+    @property
+    def target(self):
+        """Camera position, in game units"""
+        return self._target
+
+    @target.setter
+    def target(self, target):
+        target = tuple(target)
+        if target != self._target:
+            self._target = target
+            self._update()
+
+    @property
+    def screen_center(self):
+        return self._screen_center
+
+    @screen_center.setter
+    def screen_center(self, center):
+        center = tuple(center)
+        if center != self._screen_center:
+            self._screen_center = center
+            self._update()
+
+    @property
+    def matrix(self):
+        """The transform as a 3x3 matrix, for homogeneous coordinates"""
+        z = self._zoom
+        return np.array((
+            (z, 0, self._ox),
+            (0, z, self._oy),
+            (0, 0, 1.),
+        ))
+
+    def to_screen(self, x, y):
+        """World to screen coordinates of a point"""
+        return x * self._zoom + self._ox, y * self._zoom + self._oy
+
+    def to_world(self, x, y):
+        """Screen to world coordinates of a point"""
+        return (x - self._ox) / self._zoom, (y - self._oy) / self._zoom
+
+    def to_screen_array(self, points):
+        """World to screen coordinates of a list or (N, 2) array of points"""
+        return np.asarray(points, dtype=float) * self._zoom + self._offset
+
+    def to_world_array(self, points):
+        """Screen to world coordinates of a list or (N, 2) array of points"""
+        return (np.asarray(points, dtype=float) - self._offset) / self._zoom
@@ -18,6 +18,7 @@
 from __future__ import division
 
 import math
+import numpy
 import os
 import pygame
 import random
@@ -28,6 +29,8 @@ import time
 import traceback
 import weakref
 
+from collections import OrderedDict
+
 from OpenGL.GL import *
 OpenGL.ERROR_CHECKING = False
 from OpenGL.GL.EXT.framebuffer_object import *
@@ -407,7 +410,29 @@ class Gloss(object):
 
 	joysticks = []
 	auto_particle_systems = []
-	sprites = []
+	sprites = weakref.WeakSet() # live sprites, for picking
+
+	batch = None # the active SpriteBatch, if any
+
+	@staticmethod
+	def begin_batch():
+		# from now on textures are drawn through a new sprite batch
+		Gloss.flush_batch()
+		Gloss.batch = SpriteBatch()
+
+	@staticmethod
+	def flush_batch():
+		# draw the quads collected so far, if batching
+		if Gloss.batch is not None:
+			Gloss.batch.flush()
+
+	@staticmethod
+	def end_batch():
+		# draw what is left and stop batching. Return the batch, for its statistics
+		batch = Gloss.batch
+		Gloss.flush_batch()
+		Gloss.batch = None
+		return batch
 
 	@staticmethod
 	def bounce_both(value1, value2, amount, overshoot = 20):
@@ -438,6 +463,7 @@ class Gloss(object):
 		
 	@staticmethod
 	def draw_box(position = (0, 0), width = 128, height = 128, rotation = 0.0, origin = (0, 0), scale = 1, color = Color.WHITE):
+		Gloss.flush_batch()
 		glPushMatrix()
 			
 		glColor4f(color.r, color.g, color.b, color.a)
@@ -471,6 +497,7 @@ class Gloss(object):
 	
 	@staticmethod
 	def draw_line(start, finish, color = Color.WHITE, width = 1.0):
+		Gloss.flush_batch()
 		glPushMatrix()
 		glColor4f(color.r, color.g, color.b, color.a)
 		glLineWidth(width)
@@ -487,6 +514,7 @@ class Gloss(object):
 
 	@staticmethod
 	def draw_lines(lines, color = Color.WHITE, width = 1.0, join = False):
+		Gloss.flush_batch()
 		glPushMatrix()
 		glColor4f(color.r, color.g, color.b, color.a)
 		glLineWidth(width)
@@ -508,6 +536,7 @@ class Gloss(object):
 		
 	@staticmethod
 	def draw_triangle(points = [(0, 0), (-50, 100), (50, 100)], position = (0,0), rotation = 0.0, origin = (0, 0), scale = 1, color = Color.WHITE):
+		Gloss.flush_batch()
 		glPushMatrix()
 			
 		glColor4f(color.r, color.g, color.b, color.a)
@@ -549,6 +578,8 @@ class Gloss(object):
 		if Gloss.picking:
 			return
 
+		Gloss.flush_batch()
+
 		if texture is not None:
 			width = Gloss.viewport_size[0]
 			height = Gloss.viewport_size[1]
@@ -558,11 +589,12 @@ class Gloss(object):
 			glColor4f(color.r, color.g, color.b, color.a)
 			glBindTexture(GL_TEXTURE_2D, texture.surface)
 
+			u0, v0, u1, v1 = texture.uv
 			glBegin(GL_TRIANGLE_STRIP)
-			glTexCoord2f(0, texture.height_ratio); glVertex2f(0, height)
-			glTexCoord2f(texture.width_ratio, texture.height_ratio); glVertex2f(width, height)
-			glTexCoord2f(0, 1); glVertex2f(0, 0)
-			glTexCoord2f(texture.width_ratio, 1); glVertex2f(width, 0)
+			glTexCoord2f(u0, v0); glVertex2f(0, height)
+			glTexCoord2f(u1, v0); glVertex2f(width, height)
+			glTexCoord2f(u0, v1); glVertex2f(0, 0)
+			glTexCoord2f(u1, v1); glVertex2f(width, 0)
 			glEnd()
 			
 			glPopMatrix()
@@ -760,32 +792,53 @@ class Texture(object):
 				sys.exit(1)
 		else:
 			surface = source
- 
-		width = surface.get_width()
-		height = surface.get_height()
-
-		self.width = width
-		self.height = height
-		self.half_width = self.width / 2
-		self.half_height = self.height / 2
 
-		po2width = Gloss.next_po2(width)
-		po2height = Gloss.next_po2(height)
+		po2width = Gloss.next_po2(surface.get_width())
+		po2height = Gloss.next_po2(surface.get_height())
 
 		if (po2width > Gloss.MaxTextureSize or po2height > Gloss.MaxTextureSize):
 			print "Fatal error: texture at " + path + " is bigger than the maximum supported texture size of " + str(Gloss.MaxTextureSize)
 			sys.exit(1)
 
-		self.width_ratio = (self.width / po2width)
-		self.height_ratio = 1 - (self.height / po2height)
+		self.upload(*Texture.prepare(surface))
+
+	@staticmethod
+	def prepare(surface):
+		# the data uploaded for a surface: RGBA bytes, bottom row first, of
+		# the image padded to a power of two size. Returns (data, width,
+		# height, po2width, po2height)
+		width = surface.get_width()
+		height = surface.get_height()
+
+		po2width = Gloss.next_po2(width)
+		po2height = Gloss.next_po2(height)
 
 		if (width != po2width or height != po2height):
 			tmpsurface = pygame.Surface((po2width, po2height), SRCALPHA, 32)
 			tmpsurface.blit(surface, (0,0))
 			surface = tmpsurface
 
-		data = pygame.image.tostring(surface, "RGBA", 1)
-	
+		return pygame.image.tostring(surface, "RGBA", 1), width, height, po2width, po2height
+
+	@staticmethod
+	def from_data(data, width, height, po2width, po2height):
+		# a texture from data returned by prepare, e.g. read from an asset
+		# bundle. data can be any buffer
+		texture = Texture.__new__(Texture)
+		texture.surface = None
+		texture.upload(data, width, height, po2width, po2height)
+		return texture
+
+	def upload(self, data, width, height, po2width, po2height):
+		self.width = width
+		self.height = height
+		self.half_width = self.width / 2
+		self.half_height = self.height / 2
+
+		# texture coordinates of the image, padded to a power of two size:
+		# left, bottom, right, top
+		self.uv = (0, 1 - (self.height / po2height), self.width / po2width, 1)
+
 		self.surface = glGenTextures(1)
 		glBindTexture(GL_TEXTURE_2D, self.surface)
 		
@@ -793,6 +846,10 @@ class Texture(object):
 		glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
 		glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, po2width, po2height, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
 
+	def lod(self, scale):
+		# the texture to draw at this scale, see TextureLevels
+		return self
+
 	def __del__(self):
 		if self.surface is not None:
 			# before we try freeing this memory, be careful: Python may have unloaded the OpenGL module by now, in which case just bail out
@@ -805,6 +862,10 @@ class Texture(object):
 		if Gloss.picking:
 			return
 
+		if Gloss.batch is not None:
+			Gloss.batch.add(self, position, rotation, origin, scale, color)
+			return
+
 		texwidth = self.width * scale
 		texheight = self.height * scale
 
@@ -825,15 +886,264 @@ class Texture(object):
 	
 		glBindTexture(GL_TEXTURE_2D, self.surface)
 
+		u0, v0, u1, v1 = self.uv
 		glBegin(GL_TRIANGLE_STRIP)
-		glTexCoord2f(0, self.height_ratio); glVertex2f(-originx, texheight - originy)
-		glTexCoord2f(self.width_ratio, self.height_ratio); glVertex2f(texwidth - originx, texheight - originy)
-		glTexCoord2f(0, 1); glVertex2f(-originx, -originy)
-		glTexCoord2f(self.width_ratio, 1); glVertex2f(texwidth - originx, -originy)
+		glTexCoord2f(u0, v0); glVertex2f(-originx, texheight - originy)
+		glTexCoord2f(u1, v0); glVertex2f(texwidth - originx, texheight - originy)
+		glTexCoord2f(u0, v1); glVertex2f(-originx, -originy)
+		glTexCoord2f(u1, v1); glVertex2f(texwidth - originx, -originy)
 		glEnd()
-		
+
 		glPopMatrix()
 
+class AtlasTexture(Texture):
+	# a region of a TextureAtlas page, usable wherever a Texture is
+	def __init__(self, atlas, surface, x, y, width, height, page_width, page_height):
+		self.atlas = atlas # keeps the atlas pages alive
+		self.surface = surface
+		self.width = width
+		self.height = height
+		self.half_width = width / 2
+		self.half_height = height / 2
+
+		# the page is uploaded bottom row first
+		self.uv = (x / page_width, (page_height - y - height) / page_height, (x + width) / page_width, (page_height - y) / page_height)
+
+	def __del__(self):
+		# the page belongs to the atlas
+		pass
+
+class TextureLevels(object):
+	# discrete levels of detail of an image: the full size texture first,
+	# then copies halved in size (see TextureAtlas.downscale). Used as a
+	# Texture it is the full size one; Sprite.draw asks lod for the level
+	# matching the size on screen
+	def __init__(self, levels):
+		self.levels = levels
+
+		full = levels[0]
+		self.width = full.width
+		self.height = full.height
+		self.half_width = full.half_width
+		self.half_height = full.half_height
+		self.surface = full.surface
+		self.uv = full.uv
+
+	def __len__(self):
+		return len(self.levels)
+
+	def lod(self, scale):
+		# the smallest level still having a texel per screen pixel
+		width = self.width * scale
+		height = self.height * scale
+		level = 0
+		while level + 1 < len(self.levels) and self.levels[level + 1].width >= width and self.levels[level + 1].height >= height:
+			level += 1
+		return self.levels[level]
+
+class TextureAtlas(object):
+	# many small images packed in a few large textures, so that drawing them
+	# does not need a texture switch (and can share a SpriteBatch group).
+	# sources are file names or (name, surface) pairs; regions are looked
+	# up by name: atlas["art/shuttle.png"]. Images named in lod are also
+	# packed at halved sizes, named "art/space_planet.png@2", "...@4" and so
+	# on, and looked up as TextureLevels
+	def __init__(self, sources, padding = 1, max_size = None, lod = ()):
+		if max_size is None:
+			max_size = min(Gloss.MaxTextureSize, 4096)
+
+		self.upload(*TextureAtlas.render(sources, padding, max_size, lod))
+
+	@staticmethod
+	def from_data(pages, regions):
+		# an atlas from the pages and regions returned by render, e.g. read
+		# from an asset bundle
+		atlas = TextureAtlas.__new__(TextureAtlas)
+		atlas.upload(pages, regions)
+		return atlas
+
+	@staticmethod
+	def downscale(name, surface, min_size = 32):
+		# the levels of detail of an image below the full size one, as
+		# (name, surface) pairs: each level is the previous one halved, down
+		# to min_size pixels
+		levels = []
+		width, height = surface.get_size()
+		factor = 2
+		if surface.get_bitsize() < 24:
+			# smoothscale needs 24 or 32 bit pixels
+			tmpsurface = pygame.Surface((width, height), SRCALPHA, 32)
+			tmpsurface.blit(surface, (0,0))
+			surface = tmpsurface
+		while width // 2 >= min_size and height // 2 >= min_size:
+			width //= 2
+			height //= 2
+			surface = pygame.transform.smoothscale(surface, (width, height))
+			levels.append(("%s@%d" % (name, factor), surface))
+			factor *= 2
+		return levels
+
+	@staticmethod
+	def render(sources, padding, max_size, lod = ()):
+		# load and pack the sources, and the levels of detail of the ones
+		# named in lod. Returns the pages, as (width, height, RGBA data
+		# bottom row first), and the regions, as {name: (page, x, y, width,
+		# height)}
+		surfaces = {}
+		for source in sources:
+			if isinstance(source, basestring):
+				try:
+					surfaces[source] = pygame.image.load(source)
+				except:
+					print("Unable to load texture " + source + ".")
+					sys.exit(1)
+			else:
+				name, surface = source
+				surfaces[name] = surface
+
+		for name in lod:
+			surfaces.update(TextureAtlas.downscale(name, surfaces[name]))
+
+		sizes = dict((name, surface.get_size()) for name, surface in surfaces.iteritems())
+		placements, page_sizes = TextureAtlas.pack(sizes, max_size, padding)
+
+		pages = [pygame.Surface(size, SRCALPHA, 32) for size in page_sizes]
+		for name, (page, x, y) in placements.iteritems():
+			pages[page].blit(surfaces[name], (x, y))
+
+		pages = [page.get_size() + (pygame.image.tostring(page, "RGBA", 1), ) for page in pages]
+		regions = dict((name, (page, x, y) + sizes[name]) for name, (page, x, y) in placements.iteritems())
+		return pages, regions
+
+	def upload(self, pages, regions):
+		self.pages = []
+		self.regions = {}
+
+		for page_width, page_height, data in pages:
+			surface = glGenTextures(1)
+			glBindTexture(GL_TEXTURE_2D, surface)
+			glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+			glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+			glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, page_width, page_height, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+			self.pages.append(surface)
+
+		for name, (page, x, y, width, height) in regions.iteritems():
+			page_width, page_height = pages[page][:2]
+			self.regions[name] = AtlasTexture(self, self.pages[page], x, y, width, height, page_width, page_height)
+
+		# group the levels of detail: name@2, name@4... follow name
+		self.levels = {}
+		for name in self.regions:
+			base, sep, factor = name.rpartition("@")
+			if sep and factor.isdigit() and base in self.regions:
+				self.levels.setdefault(base, [self.regions[base]]).append(self.regions[name])
+		for name, levels in self.levels.items():
+			levels.sort(key = lambda texture: -texture.width)
+			self.levels[name] = TextureLevels(levels)
+
+	def __del__(self):
+		# see Texture.__del__
+		if glDeleteTextures is not None:
+			for surface in self.pages:
+				glDeleteTextures(surface)
+		self.pages = []
+
+	def __getitem__(self, name):
+		if name in self.levels:
+			return self.levels[name]
+		return self.regions[name]
+
+	def __contains__(self, name):
+		return name in self.regions
+
+	def __len__(self):
+		return len(self.regions)
+
+	@staticmethod
+	def pack(sizes, max_size, padding = 1):
+		# shelf packing of {name: (width, height)}: the tallest images first,
+		# left to right in rows, opening a new page when one is full. Images
+		# are kept padding pixels apart so that filtering does not bleed.
+		# Returns {name: (page, x, y)} and the power of two size of each page
+		def padded(size):
+			return size[0] + 2 * padding, size[1] + 2 * padding
+
+		for name, size in sizes.iteritems():
+			width, height = padded(size)
+			if width > max_size or height > max_size:
+				raise ValueError("%s (%dx%d) does not fit in a %dx%d texture" % (name, size[0], size[1], max_size, max_size))
+
+		if not sizes:
+			return {}, []
+
+		# square-ish pages, at least as wide as the widest image
+		area = sum(w * h for w, h in map(padded, sizes.values()))
+		widest = max(padded(size)[0] for size in sizes.values())
+		page_width = min(max(Gloss.next_po2(math.sqrt(area)), Gloss.next_po2(widest)), max_size)
+
+		placements = {}
+		heights = [] # used height of each page
+		page = x = y = shelf = 0
+		for name in sorted(sizes, key = lambda name: (-sizes[name][1], -sizes[name][0], name)):
+			width, height = padded(sizes[name])
+			if x + width > page_width:
+				# next shelf
+				x = 0
+				y += shelf
+				shelf = 0
+			if y + height > max_size:
+				# next page
+				heights.append(y)
+				page += 1
+				x = y = shelf = 0
+
+			placements[name] = (page, x + padding, y + padding)
+			x += width
+			shelf = max(shelf, height)
+		heights.append(y + shelf)
+
+		return placements, [(page_width, Gloss.next_po2(height)) for height in heights]
+
+class TextureRegistry(object):
+	# shares the textures loaded from files: each path is loaded once and
+	# the same Texture is handed out while anything uses it. Python reference
+	# counting frees a texture (and its GL memory) once nothing uses it;
+	# the last "keep" textures requested stay loaded in an LRU, so that
+	# short-lived users such as particle systems do not reload them
+	def __init__(self, keep = 16, load = None):
+		self.keep = keep
+		self.load = load or Texture # called with a path to load a texture
+		self.textures = weakref.WeakValueDictionary() # path -> texture in use
+		self.recent = OrderedDict() # path -> texture, least recently requested first
+		self.loads = 0
+		self.hits = 0
+
+	def __contains__(self, path):
+		return path in self.textures
+
+	def __len__(self):
+		return len(self.textures)
+
+	def get(self, path):
+		texture = self.textures.get(path)
+		if texture is None:
+			texture = self.load(path)
+			self.textures[path] = texture
+			self.loads += 1
+		else:
+			self.hits += 1
+
+		self.recent.pop(path, None)
+		self.recent[path] = texture
+		while len(self.recent) > self.keep:
+			self.recent.popitem(last = False)
+
+		return texture
+
+	def clear(self):
+		# forget the recently used textures: the ones not in use are freed
+		self.recent.clear()
+
 class Sprite(object):
 	next_id = 1
 	pick_r = 0
@@ -863,14 +1173,8 @@ class Sprite(object):
 
 		self._on_click = None
 
-		Gloss.sprites.append(weakref.ref(self))
+		Gloss.sprites.add(self)
 
-	def __del__(self):
-		# remove any dead weak references from the sprite list		
-		for i in reversed(range(len(Gloss.sprites))):
-			if Gloss.sprites[i]() is None:
-				del Gloss.sprites[i]
-				
 	def get_on_click(self):
 		return self._on_click
 
@@ -882,8 +1186,23 @@ class Sprite(object):
 
 
 	def draw(self, position = None, rotation = 0.0, origin = (0, 0), scale = 1, color = Color.WHITE):
-		texwidth = self.texture.width * scale
-		texheight = self.texture.height * scale
+		# the level of detail matching the size on screen: a smaller
+		# texture drawn at a larger scale
+		texture = self.texture.lod(scale)
+		if texture is not self.texture:
+			ratio = self.texture.width / texture.width
+			scale *= ratio
+			if origin is not None:
+				origin = (origin[0] / ratio, origin[1] / ratio)
+
+		if Gloss.batch is not None and Gloss.picking is False:
+			if position is None:
+				position = self.position
+			Gloss.batch.add(texture, position, rotation, origin, scale, color)
+			return
+
+		texwidth = texture.width * scale
+		texheight = texture.height * scale
 
 		if origin is None:
 			originx = texwidth / 2
@@ -906,13 +1225,14 @@ class Sprite(object):
 		else:
 			glColor3ub(self.pick_color[0], self.pick_color[1], self.pick_color[2])
 
-		glBindTexture(GL_TEXTURE_2D, self.texture.surface)
+		glBindTexture(GL_TEXTURE_2D, texture.surface)
 
+		u0, v0, u1, v1 = texture.uv
 		glBegin(GL_TRIANGLE_STRIP)
-		glTexCoord2f(0, self.texture.height_ratio); glVertex2f(-originx, texheight - originy)
-		glTexCoord2f(self.texture.width_ratio, self.texture.height_ratio); glVertex2f(texwidth - originx, texheight - originy)
-		glTexCoord2f(0, 1); glVertex2f(-originx, -originy)
-		glTexCoord2f(self.texture.width_ratio, 1); glVertex2f(texwidth - originx, -originy)
+		glTexCoord2f(u0, v0); glVertex2f(-originx, texheight - originy)
+		glTexCoord2f(u1, v0); glVertex2f(texwidth - originx, texheight - originy)
+		glTexCoord2f(u0, v1); glVertex2f(-originx, -originy)
+		glTexCoord2f(u1, v1); glVertex2f(texwidth - originx, -originy)
 		glEnd()
 		
 		glPopMatrix()
@@ -933,9 +1253,224 @@ class Sprite(object):
 		else:
 			self.position = (x, y)
 
+class SpriteBatch(object):
+	# Collects textured quads CPU-side and draws them grouped by texture and
+	# blend mode, with one vertex array draw call per group.
+	# Quads are drawn when the batch is flushed. Drawing functions that do not
+	# go through the batch flush it first, to keep the drawing order; within
+	# a flush, quads are drawn group by group.
+
+	# corners of a quad as fractions of its size, in the order used by
+	# Texture.draw for its triangle strip, and the two triangles of the strip
+	corner_x = numpy.array([0., 1., 0., 1.])
+	corner_y = numpy.array([1., 1., 0., 0.])
+	triangles = numpy.array([0, 1, 2, 2, 1, 3])
+
+	def __init__(self):
+		self.groups = {} # (GL texture, additive) -> list of quads
+		self.order = [] # group keys in order of first use
+		self.quads = 0 # quads drawn so far
+		self.draw_calls = 0 # draw calls issued so far
+
+	def add(self, texture, position, rotation = 0.0, origin = (0, 0), scale = 1, color = Color.WHITE, additive = False):
+		# textures packed in the same atlas share a group
+		key = (texture.surface, additive)
+		group = self.groups.get(key)
+		if group is None:
+			group = self.groups[key] = []
+			self.order.append(key)
+
+		texwidth = texture.width * scale
+		texheight = texture.height * scale
+
+		if origin is None:
+			originx = texwidth / 2
+			originy = texheight / 2
+		else:
+			originx = origin[0] * scale
+			originy = origin[1] * scale
+
+		u0, v0, u1, v1 = texture.uv
+		group.append((position[0], position[1], rotation, texwidth, texheight, originx, originy, color.r, color.g, color.b, color.a, u0, v0, u1, v1))
+
+	def add_array(self, texture, positions, rotations, scales, colors, additive = False):
+		# many quads of the same texture, centered on their positions: (n, 2)
+		# positions, n rotations and scales, (n, 4) RGBA colors
+		key = (texture.surface, additive)
+		group = self.groups.get(key)
+		if group is None:
+			group = self.groups[key] = []
+			self.order.append(key)
+
+		n = len(positions)
+		q = numpy.empty((n, 15))
+		q[:, 0:2] = positions
+		q[:, 2] = rotations
+		q[:, 3] = texture.width * scales
+		q[:, 4] = texture.height * scales
+		q[:, 5:7] = q[:, 3:5] / 2
+		q[:, 7:11] = colors
+		q[:, 11:15] = texture.uv
+		group.append(q)
+
+	@staticmethod
+	def build(quads):
+		# vertices, texture coordinates and colors of a list of quads, as
+		# float32 arrays with two triangles per quad. Items of the list are
+		# single quads or arrays of quads, from add_array
+		if any(isinstance(quad, numpy.ndarray) for quad in quads):
+			blocks = []
+			single = []
+			for quad in quads:
+				if isinstance(quad, numpy.ndarray):
+					if single:
+						blocks.append(numpy.array(single, dtype = float))
+						single = []
+					blocks.append(quad)
+				else:
+					single.append(quad)
+			if single:
+				blocks.append(numpy.array(single, dtype = float))
+			q = numpy.concatenate(blocks)
+		else:
+			q = numpy.array(quads, dtype = float)
+		fx = SpriteBatch.corner_x[SpriteBatch.triangles]
+		fy = SpriteBatch.corner_y[SpriteBatch.triangles]
+
+		# corners relative to the origin, then rotated and moved in place
+		lx = fx * q[:, 3:4] - q[:, 5:6]
+		ly = fy * q[:, 4:5] - q[:, 6:7]
+		angle = numpy.radians(q[:, 2:3])
+		c = numpy.cos(angle)
+		s = numpy.sin(angle)
+		x = q[:, 0:1] + lx * c - ly * s
+		y = q[:, 1:2] + lx * s + ly * c
+		vertices = numpy.dstack((x, y)).reshape(-1, 2).astype(numpy.float32)
+
+		u = q[:, 11:12] + fx * (q[:, 13:14] - q[:, 11:12])
+		v = fy * q[:, 12:13] + (1 - fy) * q[:, 14:15]
+		texcoords = numpy.dstack((u, v)).reshape(-1, 2).astype(numpy.float32)
+
+		colors = numpy.repeat(q[:, 7:11], len(fx), axis = 0).astype(numpy.float32)
+		return vertices, texcoords, colors
+
+	def flush(self):
+		if not self.order:
+			return
+
+		glEnableClientState(GL_VERTEX_ARRAY)
+		glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+		glEnableClientState(GL_COLOR_ARRAY)
+
+		for key in self.order:
+			surface, additive = key
+			quads = self.groups[key]
+			vertices, texcoords, colors = SpriteBatch.build(quads)
+
+			if additive:
+				glBlendFunc(GL_SRC_ALPHA, GL_ONE)
+
+			glBindTexture(GL_TEXTURE_2D, surface)
+			glVertexPointer(2, GL_FLOAT, 0, vertices)
+			glTexCoordPointer(2, GL_FLOAT, 0, texcoords)
+			glColorPointer(4, GL_FLOAT, 0, colors)
+			glDrawArrays(GL_TRIANGLES, 0, len(vertices))
+
+			if additive:
+				glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+			self.quads += len(vertices) // len(SpriteBatch.triangles)
+			self.draw_calls += 1
+
+		glDisableClientState(GL_COLOR_ARRAY)
+		glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+		glDisableClientState(GL_VERTEX_ARRAY)
+
+		self.groups = {}
+		self.order = []
+
+class LineMesh(object):
+	# a polyline kept in a GL vertex buffer. The points are given once, in
+	# any coordinates, and uploaded when first drawn; panning or zooming
+	# only changes the transform the line is drawn with
+	def __init__(self, points = None, join = False):
+		self.buffer = None
+		self.join = join # close the line
+		self.count = 0 # points in the buffer
+		self.uploads = 0 # uploads so far
+		self.pending = None # points waiting for upload
+
+		if points is not None:
+			self.set_points(points)
+
+	def __del__(self):
+		# see Texture.__del__
+		if self.buffer is not None and glDeleteBuffers is not None:
+			glDeleteBuffers(1, [self.buffer])
+			self.buffer = None
+
+	def set_points(self, points):
+		self.pending = numpy.array(points, dtype = numpy.float32).reshape(-1, 2)
+
+	def upload(self):
+		vertices = self.pending
+		self.pending = None
+
+		if self.buffer is None:
+			self.buffer = glGenBuffers(1)
+
+		glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+		glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+		glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+		self.count = len(vertices)
+		self.uploads += 1
+
+	@staticmethod
+	def gl_matrix(transform):
+		# a 3x3 affine 2D transform as the column-major 4x4 matrix of OpenGL
+		m = numpy.identity(4, dtype = numpy.float32)
+		m[0:2, 0:2] = transform[0:2, 0:2]
+		m[0:2, 3] = transform[0:2, 2]
+		return m.T.ravel()
+
+	def draw(self, transform = None, color = Color.WHITE, width = 1.0):
+		# transform maps the points to the screen, as a 3x3 matrix
+		if self.pending is not None:
+			self.upload()
+
+		if self.count < 2:
+			return
+
+		Gloss.flush_batch()
+		glPushMatrix()
+
+		if transform is not None:
+			glMultMatrixf(LineMesh.gl_matrix(transform))
+
+		glColor4f(color.r, color.g, color.b, color.a)
+		glLineWidth(width)
+		glDisable(GL_TEXTURE_2D)
+
+		glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+		glEnableClientState(GL_VERTEX_ARRAY)
+		glVertexPointer(2, GL_FLOAT, 0, None)
+
+		if self.join:
+			glDrawArrays(GL_LINE_LOOP, 0, self.count)
+		else:
+			glDrawArrays(GL_LINE_STRIP, 0, self.count)
+
+		glDisableClientState(GL_VERTEX_ARRAY)
+		glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+		glEnable(GL_TEXTURE_2D)
+		glPopMatrix()
+
 class ParticleSystem(object):
+	# particles are rows of NumPy arrays, updated and drawn all at once
 	additive = False
-	
+
 	def __init__(self, texture, position = None, lifespan = -1, creationspeed = None, initialparticles = 50, particlelifespan = 1000, minspeed = 50, maxspeed = 250, minrotation = 0, maxrotation = 0, minscale = 1.0, maxscale = 1.0, growth = 0.0, wind = None, drag = None, startcolor = Color.WHITE, endcolor = Color.TRANSPARENT_WHITE, onfinish = None, name = ""):
 		Gloss.auto_particle_systems.append(self)
 
@@ -972,36 +1507,68 @@ class ParticleSystem(object):
 		self.particle_drag = drag
 		self.particle_wind = wind
 
-		self.particles = []
+		# one row per particle
+		self.positions = numpy.zeros((0, 2))
+		self.velocities = numpy.zeros((0, 2))
+		self.created_times = numpy.zeros(0)
+		self.rotations = numpy.zeros(0)
+		self.scales = numpy.zeros(0)
+		self.anim_pos = numpy.zeros(0) # 0 at birth, 1 at the end of the particle life
 
-		for i in range(initialparticles):
-			self.create_particle()
+		self.create_particles(initialparticles)
 
 	def __del__(self):
-		self.particles = [] # destroy all particles now
+		self.positions = None # destroy all particles now
+
+	@property
+	def particle_count(self):
+		return len(self.positions)
+
+	def bounds(self):
+		# screen rectangle (left, top, right, bottom) containing the
+		# particles in any rotation, None when there are no particles
+		if not len(self.positions):
+			return None
+
+		scale = (self.scales + self.anim_pos * self.particle_growth).max()
+		radius = math.hypot(self.texture.width, self.texture.height) / 2 * scale
+		left, top = self.positions.min(axis = 0) - radius
+		right, bottom = self.positions.max(axis = 0) + radius
+		return left, top, right, bottom
+
+	@property
+	def colors(self):
+		# RGBA color of each particle, from start_color to end_color over its life
+		start = numpy.array((self.start_color.r, self.start_color.g, self.start_color.b, self.start_color.a))
+		end = numpy.array((self.end_color.r, self.end_color.g, self.end_color.b, self.end_color.a))
+		return start + (end - start) * self.anim_pos[:, numpy.newaxis]
 
 	def draw(self):
 		if self.alive is False:
 			return
-			
+
 		# never draw particle systems if picking
 		if Gloss.picking:
 			return
 
-		if self.additive:
-			glBlendFunc(GL_SRC_ALPHA, GL_ONE)
-			
-		for particle in self.particles:
-			self.texture.draw(position = particle.position, rotation = particle.rotation, origin = None, scale = particle.scale + (particle.anim_pos * self.particle_growth), color = particle.color)
+		if not len(self.positions):
+			return
+
+		if Gloss.batch is not None:
+			batch = Gloss.batch
+		else:
+			batch = SpriteBatch()
+
+		batch.add_array(self.texture, self.positions, self.rotations, self.scales + self.anim_pos * self.particle_growth, self.colors, self.additive)
 
-		if self.additive:
-			glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+		if batch is not Gloss.batch:
+			batch.flush()
 
 	def update(self):
 		# kill off old particle systems
 		if (self.lifespan == -1):
 			# long-term particle systems also need to be auto-removed if they haven't done anything for a little while
-			if len(self.particles) == 0:
+			if len(self.positions) == 0:
 				return False
 		else:
 			# if we have finished our life and all our particles are dead, return false so that the game can remove us from the list of particle systems
@@ -1012,59 +1579,49 @@ class ParticleSystem(object):
 		# do we need to create a new particle?
 		if (self.creation_speed is not None and self.last_particle_created_time + self.creation_speed < Gloss.tick_count):
 			self.create_particle()
-		
-		#cache the current wind and drag amounts to save calculation in the particle loop	
-		if self.particle_wind is not None:
-			current_wind = Point.multiply(self.particle_wind, Gloss.elapsed_seconds)
-			
-		if self.particle_drag is not None:
-			current_drag = Gloss.elapsed_seconds * self.particle_drag
-
-		for i in reversed(range(len(self.particles))):
-			particle = self.particles[i]
-			
-			if particle.created_time + self.particle_lifespan < Gloss.tick_count:
-				del self.particles[i]
 
-			particle.position = Point.add(particle.position, Point.multiply(particle.velocity, Gloss.elapsed_seconds))
+		# remove the dead particles
+		alive = self.created_times + self.particle_lifespan >= Gloss.tick_count
+		if not alive.all():
+			self.positions = self.positions[alive]
+			self.velocities = self.velocities[alive]
+			self.created_times = self.created_times[alive]
+			self.rotations = self.rotations[alive]
+			self.scales = self.scales[alive]
 
-			if self.particle_wind is not None:
-				particle.position = Point.add(particle.position, current_wind)
+		self.positions += self.velocities * Gloss.elapsed_seconds
 
-			particle.anim_pos = Gloss.clamp((Gloss.tick_count - particle.created_time) / self.particle_lifespan, 0.0, 1.0)
-			particle.color = Color.lerp(self.start_color, self.end_color, particle.anim_pos)
+		if self.particle_wind is not None:
+			self.positions += (self.particle_wind[0] * Gloss.elapsed_seconds, self.particle_wind[1] * Gloss.elapsed_seconds)
 
-			if self.particle_drag is not None:
-				particle.velocity = Point.subtract(particle.velocity, Point.multiply(particle.velocity, current_drag))
+		self.anim_pos = numpy.clip((Gloss.tick_count - self.created_times) / self.particle_lifespan, 0.0, 1.0)
 
-				if (Point.length_squared(particle.velocity) <= 0):
-					particle.velocity = Point.ZERO
+		if self.particle_drag is not None:
+			self.velocities -= self.velocities * (Gloss.elapsed_seconds * self.particle_drag)
 
 		return True
 
 	def create_particle(self):
-		particle = Particle()
+		self.create_particles(1)
 
-		particle.created_time = Gloss.tick_count
-		particle.position = self.position
-		particle.rotation = Gloss.rand_float(self.particle_rotation_min, self.particle_rotation_max)
-		particle.scale = Gloss.rand_float(self.particle_scale_min, self.particle_scale_max)
+	def create_particles(self, count):
+		angle = numpy.random.uniform(0, Gloss.TWO_PI, count)
+		speed = numpy.random.uniform(self.particle_speed_min, self.particle_speed_max, count)
 
-		angle = random.random() * Gloss.TWO_PI
-		particle.velocity = Point.multiply((math.cos(angle), math.sin(angle)), Gloss.rand_float(self.particle_speed_min, self.particle_speed_max))
+		self.positions = numpy.concatenate((self.positions, numpy.tile(numpy.array(self.position, dtype = float), (count, 1))))
+		self.velocities = numpy.concatenate((self.velocities, numpy.column_stack((numpy.cos(angle) * speed, numpy.sin(angle) * speed))))
+		self.created_times = numpy.concatenate((self.created_times, numpy.repeat(float(Gloss.tick_count), count)))
+		self.rotations = numpy.concatenate((self.rotations, numpy.random.uniform(self.particle_rotation_min, self.particle_rotation_max, count)))
+		self.scales = numpy.concatenate((self.scales, numpy.random.uniform(self.particle_scale_min, self.particle_scale_max, count)))
+		self.anim_pos = numpy.concatenate((self.anim_pos, numpy.zeros(count)))
 
 		self.last_particle_created_time = Gloss.tick_count
 
-		self.particles.append(particle)
-
-class Particle:
-	def __init__(self):
-		self.anim_pos = 0.0
-		self.color = Color.WHITE
-
 
 class RenderTarget:
-	def __init__(self, width = 512, height = 512):
+	# floating_point targets store 32 bit float channels, the others 8 bit
+	# ones, enough for a composite of textures
+	def __init__(self, width = 512, height = 512, floating_point = True):
 		self.buffer = None
 		self.surface = None
 		self.width = width
@@ -1088,7 +1645,10 @@ class RenderTarget:
 		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
 		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
 		glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-		glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F_ARB, width, height, 0, GL_RGBA, GL_FLOAT, None)
+		if floating_point:
+			glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA32F_ARB, width, height, 0, GL_RGBA, GL_FLOAT, None)
+		else:
+			glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
 
 		glFramebufferTexture2DEXT(GL_FRAMEBUFFER_EXT, GL_COLOR_ATTACHMENT0_EXT, GL_TEXTURE_2D, self.surface, 0)
 
@@ -1100,8 +1660,10 @@ class RenderTarget:
 
 		glBindFramebufferEXT(GL_FRAMEBUFFER_EXT, 0) # we don't need this activated yet, so unbind it for now
 
-	# start rendering to this framebuffer
-	def activate(self):
+	# start rendering to this framebuffer. origin is the point drawn at the
+	# top left corner of the buffer
+	def activate(self, origin = (0, 0)):
+		Gloss.flush_batch()
 		glBindFramebufferEXT(GL_FRAMEBUFFER_EXT, self.buffer)
 		Gloss.viewport_size = self.width, self.height
 		glViewport(0, 0, self.width, self.height)
@@ -1113,9 +1675,11 @@ class RenderTarget:
 		glMatrixMode(GL_MODELVIEW)
 		glPushMatrix()
 		glLoadIdentity()
+		glTranslatef(-origin[0], -origin[1], 0)
 
 	# stop rendering to this framebuffer
 	def deactivate(self):
+		Gloss.flush_batch()
 		glBindFramebufferEXT(GL_FRAMEBUFFER_EXT, 0)
 		Gloss.viewport_size = Gloss.screen_resolution
 		glViewport(0, 0, Gloss.screen_resolution[0], Gloss.screen_resolution[1])
@@ -1133,11 +1697,18 @@ class RenderTarget:
 		self.buffer = None
 		self.surface = None
 
-	# draw the contents of the buffer to the screen
-	def draw(self, position, width = None, height = None, rotation = 0.0, origin = (0, 0), scale = 1, color = Color.WHITE):
+	# draw the contents of the buffer to the screen. Without blending the
+	# buffer replaces what is below, alpha included
+	def draw(self, position, width = None, height = None, rotation = 0.0, origin = (0, 0), scale = 1, color = Color.WHITE, blend = True):
+		# the batched quads go below
+		Gloss.flush_batch()
+
 		# always draw this texture, even when picking
 		glEnable(GL_TEXTURE_2D)
 
+		if not blend:
+			glDisable(GL_BLEND)
+
 		if width is None: width = self.width
 		if height is None: height = self.height
 
@@ -1172,6 +1743,9 @@ class RenderTarget:
 		glTexCoord2f(1, 1); glVertex2f(texwidth - originx, -originy)
 		glEnd()
 
+		if not blend:
+			glEnable(GL_BLEND)
+
 		# disable texturing if we're picking
 		if Gloss.enable_texturing is False:
 			glDisable(GL_TEXTURE_2D)
@@ -1179,30 +1753,92 @@ class RenderTarget:
 		glPopMatrix()
 
 class SpriteFont(object):
+	# the letters are rendered once in a glyph atlas; each string drawn is
+	# turned into a vertex array, cached by (text, scale, spacing), and drawn
+	# with one draw call
+	mesh_cache_size = 128 # strings kept, the least recently drawn are dropped
+
 	def __init__(self, filename, size = 18, bold = False, underline = False, startcharacter = 32, endcharacter = 126):
 	        self.font = pygame.font.Font(filename, size)
 		self.font.set_underline(bold)
 		self.font.set_bold(underline)
 
-	        self.characters = {}
-
-		for letter in range(startcharacter, endcharacter + 1):
-		    self.characters[chr(letter)] = SpriteFontLetter(self.font, chr(letter))
+		glyphs = [(chr(letter), self.font.render(chr(letter), True, (255,255,255))) for letter in range(startcharacter, endcharacter + 1)]
+		self.atlas = TextureAtlas(glyphs)
+	        self.characters = self.atlas.regions
 
 		self.line_height = self.characters["A"].height
 
+		self.meshes = OrderedDict() # (text, scale, letterspacing, linespacing) -> [(GL texture, vertices, texcoords)]
+		self.mesh_hits = 0
+		self.mesh_misses = 0
+
+	def build_mesh(self, text, scale = 1.0, letterspacing = 0, linespacing = 0):
+		# the letter quads of a string, laid out from (0, 0) as draw used to
+		# place them one by one, grouped by atlas page
+		letterspacing *= scale
+		linespacing *= scale
+
+		pages = {}
+		order = []
+		y = 0
+
+		for line in text.splitlines():
+			x = 0
+			texheight = self.line_height * scale
+
+			for letter in line:
+				lettertexture = self.characters[letter]
+
+				texheight = lettertexture.height * scale
+				texwidth = lettertexture.width * scale
+
+				quads = pages.get(lettertexture.surface)
+				if quads is None:
+					quads = pages[lettertexture.surface] = []
+					order.append(lettertexture.surface)
+
+				u0, v0, u1, v1 = lettertexture.uv
+				quads.append((x, y, 0, texwidth, texheight, 0, 0, 1, 1, 1, 1, u0, v0, u1, v1))
+
+				x += texwidth + letterspacing
+
+			# carriage return + line feed
+			y += texheight + linespacing
+
+		mesh = []
+		for surface in order:
+			vertices, texcoords, colors = SpriteBatch.build(pages[surface])
+			mesh.append((surface, vertices, texcoords))
+
+		return mesh
+
+	def get_mesh(self, text, scale = 1.0, letterspacing = 0, linespacing = 0):
+		key = (text, scale, letterspacing, linespacing)
+		mesh = self.meshes.pop(key, None)
+
+		if mesh is None:
+			self.mesh_misses += 1
+			mesh = self.build_mesh(text, scale, letterspacing, linespacing)
+			while len(self.meshes) >= self.mesh_cache_size:
+				self.meshes.popitem(last = False)
+		else:
+			self.mesh_hits += 1
+
+		self.meshes[key] = mesh # most recently drawn
+		return mesh
+
 	def draw(self, text = "Hello, Gloss!", position = (0, 0), rotation = 0.0, scale = 1.0, color = Color.WHITE, letterspacing = 0, linespacing = 0):
 		# don't draw text when picking
 		if Gloss.picking:
 			return
 
-		currentwidth = 0 # used to reset to the start of the line when breaking
+		Gloss.flush_batch()
 
 		if position is None:
 			position = self.position
 
-		letterspacing *= scale
-		linespacing *= scale
+		mesh = self.get_mesh(text, scale, letterspacing, linespacing)
 
 		glPushMatrix()
 		glTranslatef(position[0], position[1], 0)
@@ -1212,31 +1848,18 @@ class SpriteFont(object):
 
 		glColor4f(color.r, color.g, color.b, color.a)
 
-		lines = text.splitlines()
-
-		for line in lines:
-			for letter in line:
-				lettertexture = self.characters[letter]
-
-				texheight = lettertexture.height * scale
-				texwidth = lettertexture.width * scale
-
-				glBindTexture(GL_TEXTURE_2D, lettertexture.surface)
+		glEnableClientState(GL_VERTEX_ARRAY)
+		glEnableClientState(GL_TEXTURE_COORD_ARRAY)
 
-				glBegin(GL_TRIANGLE_STRIP)
-				glTexCoord2f(0, lettertexture.height_ratio); glVertex2f(0, texheight)
-				glTexCoord2f(lettertexture.width_ratio, lettertexture.height_ratio); glVertex2f(texwidth, texheight)
-				glTexCoord2f(0, 1); glVertex2f(0, 0)
-				glTexCoord2f(lettertexture.width_ratio, 1); glVertex2f(texwidth, 0)
-				glEnd()
+		for surface, vertices, texcoords in mesh:
+			glBindTexture(GL_TEXTURE_2D, surface)
+			glVertexPointer(2, GL_FLOAT, 0, vertices)
+			glTexCoordPointer(2, GL_FLOAT, 0, texcoords)
+			glDrawArrays(GL_TRIANGLES, 0, len(vertices))
 
-				glTranslatef(texwidth + letterspacing, 0, 0)
-				currentwidth += texwidth + letterspacing
+		glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+		glDisableClientState(GL_VERTEX_ARRAY)
 
-			# carriage return + line feed
-			glTranslatef(-currentwidth, texheight + linespacing, 0)
-			currentwidth = 0
-			
 		glPopMatrix()
 
 	def measure_string(self, text, scale = 1.0, letterspacing = 0, linespacing = 0):
@@ -1265,38 +1888,3 @@ class SpriteFont(object):
 			maxheight += texheight + linespacing
 
 		return maxwidth,maxheight
-
-class SpriteFontLetter(object):
-	def __init__(self, font, letter):
-		surface = font.render(letter, True, (255,255,255))
-
-		width = surface.get_width()
-		height = surface.get_height()
-
-		self.width = width
-		self.height = height
-		self.half_width = self.width / 2
-		self.half_height = self.height / 2
-
-		po2width = Gloss.next_po2(width)
-		po2height = Gloss.next_po2(height)
-
-		if (po2width > Gloss.MaxTextureSize or po2height > Gloss.MaxTextureSize):
-			print "Fatal error: texture at " + path + " is bigger than the maximum supported texture size of " + str(Gloss.MaxTextureSize)
-			sys.exit(1)
-
-		self.width_ratio = (self.width / po2width)
-		self.height_ratio = 1 - (self.height / po2height)
-
-		if (width != po2width or height != po2height):
-			tmpsurface = pygame.Surface((po2width, po2height), SRCALPHA, 32)
-			tmpsurface.blit(surface, (0,0))
-			surface = tmpsurface
-
-		letter = pygame.image.tostring(surface, 'RGBA', 1)
-
-		self.surface = glGenTextures(1)
-		glBindTexture(GL_TEXTURE_2D, self.surface)
-		glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-		glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-		glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, po2width, po2height, 0, GL_RGBA, GL_UNSIGNED_BYTE, letter)
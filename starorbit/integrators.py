@@ -0,0 +1,202 @@
+#
+# Numerical integrators
+# All integrators share the same interface: step(pos, vel, accel, dt)
+# advances pos and vel by dt, where accel(pos) returns the acceleration at
+# the given positions, and returns the new (pos, vel). Arrays of bodies are
+# updated in place; a single body can also be given as complex numbers
+# x + yj, much cheaper than one row arrays, and is then only returned.
+# They are used both by the live simulation and by orbit prediction.
+#
+
+import numpy as np
+
+
+class Integrator(object):
+    """Base integrator"""
+    def step(self, pos, vel, accel, dt):
+        """Advance pos and vel by dt, return them"""
+        raise NotImplementedError
+
+
+class SemiImplicitEuler(Integrator):
+    """First order, symplectic. One acceleration evaluation per step"""
+    def step(self, pos, vel, accel, dt):
+        vel += accel(pos) * dt
+        pos += vel * dt
+        return pos, vel
+
+
+class Leapfrog(Integrator):
+    """Leapfrog (position Verlet, drift-kick-drift): second order,
+    symplectic, time reversible. One acceleration evaluation per step
+    """
+    def step(self, pos, vel, accel, dt):
+        pos += vel * (dt / 2.)
+        vel += accel(pos) * dt
+        pos += vel * (dt / 2.)
+        return pos, vel
+
+
+class Yoshida4(Integrator):
+    """Yoshida fourth order symplectic integrator: three leapfrog substeps
+    with tuned weights. Three acceleration evaluations per step
+    """
+    _w1 = 1 / (2 - 2 ** (1 / 3.))
+    _w0 = -2 ** (1 / 3.) * _w1
+    _c = (_w1 / 2, (_w0 + _w1) / 2, (_w0 + _w1) / 2, _w1 / 2)
+    _d = (_w1, _w0, _w1)
+
+    def step(self, pos, vel, accel, dt):
+        for c, d in zip(self._c, self._d):
+            pos += vel * (c * dt)
+            vel += accel(pos) * (d * dt)
+        pos += vel * (self._c[-1] * dt)
+        return pos, vel
+
+
+class RK45(Integrator):
+    """Dormand-Prince 5(4) Runge-Kutta with adaptive step size.
+    Each step is split in as many substeps as needed to keep the local error
+    within tolerance. The substep length is remembered across calls.
+    Not symplectic: seven acceleration evaluations per substep
+    """
+    _a = (
+        (),
+        (1 / 5.,),
+        (3 / 40., 9 / 40.),
+        (44 / 45., -56 / 15., 32 / 9.),
+        (19372 / 6561., -25360 / 2187., 64448 / 6561., -212 / 729.),
+        (9017 / 3168., -355 / 33., 46732 / 5247., 49 / 176.,
+            -5103 / 18656.),
+        (35 / 384., 0, 500 / 1113., 125 / 192., -2187 / 6784., 11 / 84.),
+    )
+    # fifth order weights are the last row of _a, these give the error
+    _e = (71 / 57600., 0, -71 / 16695., 71 / 1920., -17253 / 339200.,
+        22 / 525., -1 / 40.)
+
+    def __init__(self, rtol=1e-6, atol=1e-6, max_substeps=1000):
+        self.rtol = rtol
+        self.atol = atol
+        self.max_substeps = max_substeps
+        self._h = None
+        # steps that ran out of substeps, see step()
+        self.exhausted = 0
+
+    def _substep(self, x, v, hs, accel):
+        """Fifth order solution after hs, and its error estimate"""
+        kx, kv = [], []
+        for row in self._a:
+            xi = x
+            vi = v
+            for a, dx, dv in zip(row, kx, kv):
+                if a:
+                    xi = xi + dx * (a * hs)
+                    vi = vi + dv * (a * hs)
+            kx.append(vi)
+            kv.append(accel(xi))
+
+        # the last stage is evaluated at the fifth order solution
+        x_new = x + sum(a * dx for a, dx in zip(self._a[-1], kx)) * hs
+        v_new = v + sum(a * dv for a, dv in zip(self._a[-1], kv)) * hs
+        ex = sum(e * dx for e, dx in zip(self._e, kx)) * hs
+        ev = sum(e * dv for e, dv in zip(self._e, kv)) * hs
+        return x_new, v_new, ex, ev
+
+    def step(self, pos, vel, accel, dt):
+        x = pos
+        v = vel
+        h = self._h or dt
+        t = 0.
+        for _ in xrange(self.max_substeps):
+            if t >= dt:
+                break
+            hs = min(h, dt - t)
+            x_new, v_new, ex, ev = self._substep(x, v, hs, accel)
+            err = max(
+                np.max(np.abs(ex) / (self.atol + self.rtol * np.abs(x_new))),
+                np.max(np.abs(ev) / (self.atol + self.rtol * np.abs(v_new))),
+            )
+            factor = 5. if err == 0 else min(5., max(.2, .9 * err ** -.2))
+            if err <= 1:
+                t += hs
+                x, v = x_new, v_new
+                if hs < h:
+                    # shortened to land on dt: do not shrink the next step
+                    factor = max(factor, 1.)
+                    hs = h
+            h = min(hs * factor, dt)
+
+        if t < dt:
+            # out of substeps: cover the rest of dt in one step, whatever
+            # its error, so that the bodies stay in sync with game time
+            self.exhausted += 1
+            x, v = self._substep(x, v, dt - t, accel)[:2]
+
+        self._h = h
+        if isinstance(pos, np.ndarray):
+            pos[:] = x
+            vel[:] = v
+        return x, v
+
+
+INTEGRATORS = {
+    'euler': SemiImplicitEuler,
+    'leapfrog': Leapfrog,
+    'verlet': Leapfrog,
+    'yoshida4': Yoshida4,
+    'rk45': RK45,
+}
+
+
+def get_integrator(name):
+    """Create an integrator by name"""
+    try:
+        return INTEGRATORS[name]()
+    except KeyError:
+        raise ValueError("Unknown integrator %r, choose from: %s" % (name,
+            ', '.join(sorted(INTEGRATORS))))
+
+
+def energy_drift(integrator, dt, orbits=10, mass=4., radius=200.,
+        eccentricity=.5):
+    """Relative energy error after some revolutions on an eccentric orbit
+    around a sun. Return (max relative energy error, acceleration evaluations)
+    """
+    from physics import G, suns_acceleration
+    sun_pos = np.zeros((1, 2))
+    sun_mass = np.array([mass])
+    calls = [0]
+
+    def accel(p):
+        calls[0] += 1
+        return suns_acceleration(p, sun_pos, sun_mass)
+
+    # start at apoapsis
+    mu = G * mass
+    a = radius / (1 + eccentricity)
+    pos = np.array([[radius, 0.]])
+    vel = np.array([[0., np.sqrt(mu * (1 - eccentricity) / radius)]])
+    period = 2 * np.pi * np.sqrt(a ** 3 / mu)
+
+    def energy():
+        return .5 * (vel ** 2).sum() - mu / np.sqrt((pos ** 2).sum())
+
+    e0 = energy()
+    worst = 0
+    for i in xrange(int(orbits * period / dt)):
+        integrator.step(pos, vel, accel, dt)
+        worst = max(worst, abs((energy() - e0) / e0))
+    return worst, calls[0]
+
+
+def compare(dts=(.5, 1, 2, 4, 8)):
+    """Compare energy error and cost of the integrators"""
+    print "integrator  dt     energy_err  accel_evals"
+    for name in ('euler', 'leapfrog', 'yoshida4', 'rk45'):
+        for dt in dts:
+            err, calls = energy_drift(get_integrator(name), dt)
+            print "%-10s  %-5s  %.2e    %d" % (name, dt, err, calls)
+
+
+if __name__ == '__main__':
+    compare()
@@ -0,0 +1,121 @@
+#
+# Keplerian orbits
+# When a single sun dominates, an orbit is a conic section that can be
+# computed in closed form from the position and speed of the body
+#
+
+import math
+import numpy as np
+
+from physics import G, suns_acceleration
+
+
+class Conic(object):
+    """Orbit of a body around a single attractor, from its state vectors
+    relative to the attractor. mu is G * attractor mass
+    """
+    def __init__(self, r, v, mu):
+        self.r = np.asarray(r, dtype=float)
+        self.v = np.asarray(v, dtype=float)
+        self.mu = mu
+        rm = math.hypot(*self.r)
+        # specific angular momentum, a scalar in 2D. Its sign tells CCW/CW
+        self.h = self.r[0] * self.v[1] - self.r[1] * self.v[0]
+        self.direction = 1 if self.h >= 0 else -1
+        e_vec = ((self.v.dot(self.v) - mu / rm) * self.r -
+            self.r.dot(self.v) * self.v) / mu
+        self.e = math.hypot(*e_vec)
+        # argument of periapsis
+        self.omega = math.atan2(e_vec[1], e_vec[0]) if self.e > 1e-9 else 0.
+        # semi-latus rectum
+        self.p = self.h ** 2 / mu
+        energy = self.v.dot(self.v) / 2 - mu / rm
+        self.a = -mu / (2 * energy) if energy else float('inf')
+
+    @property
+    def kind(self):
+        """'ellipse', 'hyperbola' or 'degenerate' (radial or parabolic)"""
+        if self.p < 1e-9 or abs(self.e - 1) < 1e-6:
+            return 'degenerate'
+        return 'ellipse' if self.e < 1 else 'hyperbola'
+
+    @property
+    def period(self):
+        """Orbital period, for closed orbits"""
+        assert self.kind == 'ellipse', "Only elliptic orbits have a period"
+        return 2 * math.pi * math.sqrt(self.a ** 3 / self.mu)
+
+    def _to_perifocal(self, p):
+        """Rotate a point into the frame with periapsis along x, where the
+        body always moves counterclockwise
+        """
+        c, s = math.cos(self.omega), math.sin(self.omega)
+        x = c * p[0] + s * p[1]
+        y = -s * p[0] + c * p[1]
+        return x, y * self.direction
+
+    def _from_perifocal(self, x, y):
+        """Inverse of _to_perifocal, on arrays"""
+        y = y * self.direction
+        c, s = math.cos(self.omega), math.sin(self.omega)
+        return np.column_stack((c * x - s * y, s * x + c * y))
+
+    def sample(self, n=360, max_distance=3000.):
+        """Sample n points along the orbit, relative to the attractor,
+        starting from the current position in the direction of motion.
+        Ellipses are sampled for one revolution, hyperbolas until they reach
+        max_distance
+        """
+        kind = self.kind
+        assert kind != 'degenerate', "Degenerate orbit"
+        x0, y0 = self._to_perifocal(self.r)
+        e = self.e
+
+        if kind == 'ellipse':
+            # uniform in eccentric anomaly
+            a = self.a
+            b = a * math.sqrt(1 - e ** 2)
+            E0 = math.atan2(y0 / b, x0 / a + e)
+            E = E0 + np.linspace(0, 2 * math.pi, n)
+            return self._from_perifocal(a * (np.cos(E) - e), b * np.sin(E))
+
+        # hyperbola, uniform in hyperbolic anomaly
+        a = -self.a
+        b = a * math.sqrt(e ** 2 - 1)
+        F0 = math.asinh(y0 / b)
+        F_max = math.acosh(max(1., (max_distance / a + 1) / e))
+        F = np.linspace(F0, max(F_max, F0 + 1), n)
+        return self._from_perifocal(a * (e - np.cosh(F)), b * np.sinh(F))
+
+
+def predict_orbit(pos, vel, sun_pos, sun_mass, n=360, tolerance=.01,
+        max_distance=3000.):
+    """Predict the orbit of a body in closed form around the dominant sun.
+    Return a (n, 2) array of positions, or None when the orbit is degenerate
+    or other suns pull more than tolerance times the dominant one anywhere
+    along the orbit. In that case numerical prediction is needed.
+    """
+    pos = np.asarray(pos, dtype=float)
+    if not len(sun_mass):
+        return None
+    # the dominant sun is the one that pulls harder now
+    d2 = ((sun_pos - pos) ** 2).sum(axis=1)
+    dominant = int(np.argmax(sun_mass / d2))
+    focus = sun_pos[dominant]
+    conic = Conic(pos - focus, vel, G * sun_mass[dominant])
+    if conic.kind == 'degenerate':
+        return None
+
+    points = conic.sample(n, max_distance) + focus
+    if len(sun_mass) > 1:
+        others = np.arange(len(sun_mass)) != dominant
+        main = suns_acceleration(points, sun_pos[dominant:dominant + 1],
+            sun_mass[dominant:dominant + 1])
+        perturbation = suns_acceleration(points, sun_pos[others],
+            sun_mass[others])
+        ratio = np.sqrt((perturbation ** 2).sum(axis=1) /
+            (main ** 2).sum(axis=1))
+        if not ratio.max() <= tolerance:
+            return None
+
+    return points
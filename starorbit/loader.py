@@ -0,0 +1,67 @@
+#
+# Asset loader
+# Runs decoding jobs (image loading, texture padding and conversion, audio
+# decoding) on a thread pool while the main thread keeps the display alive
+# and reports progress. GL calls stay on the main thread: jobs only
+# produce data to be uploaded.
+#
+
+from collections import OrderedDict
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+
+class AssetLoader(object):
+    """Named jobs running on a thread pool.
+    Jobs start in the order they are added; a job can wait for the
+    results of jobs added before it.
+    """
+    def __init__(self, workers=None):
+        self._pool = ThreadPool(workers or cpu_count())
+        self._jobs = OrderedDict() # name -> AsyncResult
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __contains__(self, name):
+        return name in self._jobs
+
+    def add(self, name, func, *args):
+        """Queue func(*args)"""
+        self._jobs[name] = self._pool.apply_async(func, args)
+
+    def get(self, name):
+        """Wait for the result of a job. Exceptions raised by the job are
+        raised again here
+        """
+        job = self._jobs[name]
+        # in Python 2 a finished job wakes up a single waiter, maybe the
+        # main thread in wait(): never wait without a timeout
+        while not job.ready():
+            job.wait(.05)
+        return job.get()
+
+    @property
+    def progress(self):
+        """Fraction of the jobs completed"""
+        if not self._jobs:
+            return 1.
+        done = sum(1 for job in self._jobs.itervalues() if job.ready())
+        return done / float(len(self._jobs))
+
+    def wait(self, callback=None, interval=.05):
+        """Wait for all the jobs and shut the pool down. Return the results
+        as a dict. callback(progress) is called every interval seconds
+        meanwhile, and at the end
+        """
+        for job in self._jobs.itervalues():
+            while not job.ready():
+                if callback:
+                    callback(self.progress)
+                job.wait(interval)
+        if callback:
+            callback(1.)
+        self._pool.close()
+        self._pool.join()
+        return OrderedDict((name, job.get())
+            for name, job in self._jobs.iteritems())
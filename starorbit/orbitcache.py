@@ -0,0 +1,71 @@
+#
+# Orbit prediction cache
+# Predicted trajectories are memoized by quantized position and speed, so
+# repeated manoeuvres do not need a new prediction
+#
+
+from collections import OrderedDict
+import numpy as np
+
+
+class OrbitCache(object):
+    """LRU cache of predicted orbits.
+    Orbits are stored relative to their starting position: a near-identical
+    state reuses the cached orbit, translated to start from the actual
+    position. The cache is cleared whenever the suns change.
+    """
+    def __init__(self, size=64, pos_quantum=1., vel_quantum=.005):
+        self.size = size
+        self.pos_quantum = pos_quantum
+        self.vel_quantum = vel_quantum
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._orbits = OrderedDict()
+        self._suns = None
+
+    def __len__(self):
+        return len(self._orbits)
+
+    def _key(self, pos, vel):
+        """Quantized state"""
+        pq, vq = self.pos_quantum, self.vel_quantum
+        return (int(round(pos[0] / pq)), int(round(pos[1] / pq)),
+            int(round(vel[0] / vq)), int(round(vel[1] / vq)))
+
+    def _check_suns(self, sun_pos, sun_mass):
+        """Invalidate the cache if the suns changed"""
+        suns = (tuple(np.ravel(sun_pos)), tuple(np.ravel(sun_mass)))
+        if suns != self._suns:
+            if self._orbits:
+                self.invalidate()
+            self._suns = suns
+
+    def invalidate(self):
+        """Drop all cached orbits"""
+        self._orbits.clear()
+        self.invalidations += 1
+
+    def get(self, pos, vel, sun_pos, sun_mass):
+        """Return the cached orbit as a (N, 2) array starting from pos,
+        or None
+        """
+        self._check_suns(sun_pos, sun_mass)
+        key = self._key(pos, vel)
+        relative = self._orbits.pop(key, None)
+        if relative is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._orbits[key] = relative # most recently used
+        return relative + pos
+
+    def put(self, pos, vel, sun_pos, sun_mass, points):
+        """Store an orbit predicted from the given state"""
+        self._check_suns(sun_pos, sun_mass)
+        key = self._key(pos, vel)
+        self._orbits.pop(key, None)
+        self._orbits[key] = np.asarray(points, dtype=float) - pos
+        while len(self._orbits) > self.size:
+            self._orbits.popitem(last=False)
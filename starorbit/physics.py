@@ -0,0 +1,135 @@
+#
+# N-body state engine
+# The state of every moving body (satellites, starship) lives in contiguous
+# NumPy arrays and is advanced by a single vectorized step per frame
+#
+
+import numpy as np
+
+from integrators import SemiImplicitEuler
+from spatialhash import SpatialHash
+
+G = 10.125
+
+
+def suns_acceleration(pos, sun_pos, sun_mass):
+    """Gravitational acceleration of each position relative to the suns
+    pos: (N, 2) array, sun_pos: (S, 2) array, sun_mass: (S,) array
+    Return a (N, 2) array
+    """
+    acc = np.zeros_like(pos)
+    # there are only a few suns: loop over them, vectorize over the bodies
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for sp, sm in zip(sun_pos, sun_mass):
+            d = sp - pos
+            dist2 = (d * d).sum(axis=1)
+            acc += d * (G * sm / (dist2 * np.sqrt(dist2)))[:, None]
+    return acc
+
+
+class SunsGravity(object):
+    """Gravity model: bodies are attracted by the suns only"""
+    def acceleration(self, pos, mass, sun_pos, sun_mass):
+        """Acceleration of each body"""
+        return suns_acceleration(pos, sun_pos, sun_mass)
+
+
+class BodyStore(object):
+    """Structure-of-arrays storage for the state of all moving bodies.
+    Each body owns a slot index; Satellite and Starship are thin views
+    over their slot.
+    The gravity model can be replaced, see barneshut.BarnesHutGravity,
+    and so can the integrator, see integrators.py
+    After each step self.grid indexes the live bodies by slot, for
+    collision and proximity queries.
+    """
+    def __init__(self, capacity=64, gravity=None, integrator=None,
+            body_radius=2.5):
+        self.gravity = gravity or SunsGravity()
+        self.integrator = integrator or SemiImplicitEuler()
+        self.body_radius = body_radius
+        self.grid = SpatialHash()
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.mass = np.zeros(capacity)
+        # bodies whose mass attracts the others, when the gravity model has
+        # mutual attraction
+        self.attracts = np.zeros(capacity, dtype=bool)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.collided = np.zeros(capacity, dtype=bool)
+        # the object each slot belongs to
+        self.owners = [None] * capacity
+        self._free = []
+        self._used = 0 # high water mark: slots past it were never used
+
+    def __len__(self):
+        """Number of live bodies"""
+        return self._used - len(self._free)
+
+    def _grow(self):
+        """Double the capacity of all arrays"""
+        capacity = len(self.mass) * 2
+        for name in ('pos', 'vel', 'mass', 'attracts', 'alive', 'collided'):
+            old = getattr(self, name)
+            new = np.zeros((capacity, ) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.owners.extend([None] * (capacity - len(self.owners)))
+
+    def add(self, pos, vel, mass, owner=None, attracts=True):
+        """Allocate a slot for a new body, return its index.
+        A body that does not attract is still attracted by the others
+        """
+        if self._free:
+            i = self._free.pop()
+        else:
+            if self._used == len(self.mass):
+                self._grow()
+            i = self._used
+            self._used += 1
+
+        self.pos[i] = pos
+        self.vel[i] = vel
+        self.mass[i] = mass
+        self.attracts[i] = attracts
+        self.alive[i] = True
+        self.collided[i] = False
+        self.owners[i] = owner
+        return i
+
+    def remove(self, i):
+        """Release a body slot"""
+        assert self.alive[i], "Slot %d is not in use" % i
+        self.alive[i] = False
+        self.collided[i] = False
+        self.vel[i] = 0
+        self.owners[i] = None
+        self._free.append(i)
+
+    def step(self, sun_pos, sun_mass, dt=1, collision_thresh=15):
+        """Advance all bodies by dt and flag the ones that collided with
+        a sun or with each other
+        """
+        n = self._used
+        pos = self.pos[:n]
+        vel = self.vel[:n]
+        alive = self.alive[:n]
+        # mass of the bodies as sources of gravity
+        mass = np.where(self.attracts[:n], self.mass[:n], 0.)[alive]
+
+        def accel(p):
+            acc = np.zeros_like(p)
+            acc[alive] = self.gravity.acceleration(p[alive], mass, sun_pos,
+                sun_mass)
+            return acc
+
+        self.integrator.step(pos, vel, accel, dt)
+
+        slots = np.flatnonzero(alive)
+        self.grid.build(pos[slots], slots)
+        self.collided[:n] = False
+        for sp in sun_pos:
+            self.collided[self.grid.query_radius(sp, collision_thresh)] = True
+        i, j = self.grid.pairs(self.body_radius * 2)
+        self.collided[i] = True
+        self.collided[j] = True
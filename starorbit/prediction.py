@@ -0,0 +1,93 @@
+#
+# Numerical orbit prediction
+# Runs in a worker thread on a snapshot of the ship and sun state, and
+# streams the predicted points back in chunks
+#
+
+from Queue import Queue
+from threading import Thread, Event
+import numpy as np
+
+from physics import G
+
+
+def predict_chunks(pos, vel, sun_pos, sun_mass, integrator, steps=100,
+        spacing=5., closing=6., max_points=500):
+    """Integrate an orbit, yielding lists of (x, y) points every `steps`
+    integration steps. Points are at least `spacing` apart. Stop when the
+    orbit gets back within `closing` of the start or after max_points.
+    """
+    # a single body: plain Python complex numbers x + yj are much cheaper
+    # than NumPy operations on one row arrays. The worker holds the GIL
+    # either way, so this is time given back to the main thread
+    suns = [(complex(*sp), G * float(sm)) for sp, sm in zip(sun_pos, sun_mass)]
+
+    def accel(p):
+        """Acceleration towards the suns, see physics.suns_acceleration"""
+        a = 0j
+        for sp, gm in suns:
+            d = sp - p
+            r = abs(d)
+            if r:
+                a += d * (gm / (r * r * r))
+        return a
+
+    pos = complex(*pos)
+    vel = complex(*vel)
+    start = last = (pos.real, pos.imag)
+    count = 1
+    spacing2 = spacing ** 2
+    closing2 = closing ** 2
+
+    while True:
+        chunk = []
+        for i in xrange(steps):
+            pos, vel = integrator.step(pos, vel, accel, 1)
+            x, y = pos.real, pos.imag
+
+            if count > 10 and (x - start[0]) ** 2 + (y - start[1]) ** 2 < \
+                    closing2:
+                chunk.append((x, y))
+                yield chunk
+                return
+
+            if (x - last[0]) ** 2 + (y - last[1]) ** 2 > spacing2:
+                chunk.append((x, y))
+                last = (x, y)
+                count += 1
+                if count > max_points:
+                    yield chunk
+                    return
+
+        yield chunk
+
+
+class OrbitPredictionJob(Thread):
+    """Worker thread running predict_chunks on a snapshot of the state.
+    Chunks of points are put in self.points, followed by None when done.
+    A cancelled job stops at the next chunk and produces nothing more.
+    """
+    def __init__(self, pos, vel, sun_pos, sun_mass, integrator, **kwargs):
+        Thread.__init__(self, name='orbit prediction')
+        self.daemon = True
+        self.points = Queue()
+        self._cancelled = Event()
+        self._args = (tuple(pos), tuple(vel), np.array(sun_pos, dtype=float),
+            np.array(sun_mass, dtype=float), integrator)
+        self._kwargs = kwargs
+
+    def cancel(self):
+        """Stop the prediction"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        for chunk in predict_chunks(*self._args, **self._kwargs):
+            if self.cancelled:
+                return
+            if chunk:
+                self.points.put(chunk)
+        self.points.put(None)
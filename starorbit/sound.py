@@ -2,25 +2,40 @@ import pygame
 
 class SoundPlayer(object):
     """Sound player: generate sounds and music"""
-    def __init__(self):
+    sounds = (
+        # mission sounds
+        ('discovery_meco', 'NASA_discovery_meco', .5),
+        ('discovery_vector_transfer', 'NASA_discovery_vector_transfer', .5),
+        ('wheelstop', 'NASA_discovery_wheelstop', .5),
+        ('gear', 'NASA_shuttle_gear', .5),
+        ('planet', 'NASA_cassini_saturn', .5),
+        ('thruster', 'NASA_thruster', .7),
+        # background sounds
+        ('beep', 'NASA_beep', .2),
+    )
+
+    def __init__(self, assets=None, decoded=None):
+        """Load the sounds. Sounds already decoded can be given as a dict
+        by file name, or come from an asset bundle
+        """
         self._sounds = {}
         self._sounds_max_vol = {}
         pygame.mixer.init()
-        sounds = (
-            # mission sounds
-            ('discovery_meco', 'NASA_discovery_meco', .5),
-            ('discovery_vector_transfer', 'NASA_discovery_vector_transfer', .5),
-            ('wheelstop', 'NASA_discovery_wheelstop', .5),
-            ('gear', 'NASA_shuttle_gear', .5),
-            ('planet', 'NASA_cassini_saturn', .5),
-            ('thruster', 'NASA_thruster', .7),
-            # background sounds
-            ('beep', 'NASA_beep', .2),
-        )
-        for name, fname, max_vol in sounds:
-            self._sounds[name] = pygame.mixer.Sound("sound/%s.ogg" % fname)
+        for name, fname, max_vol in self.sounds:
+            path = "sound/%s.ogg" % fname
+            sound = decoded.get(path) if decoded else None
+            if sound is None and assets is not None:
+                sound = assets.sound(path)
+            if sound is None:
+                sound = pygame.mixer.Sound(path)
+            self._sounds[name] = sound
             self._sounds_max_vol[name] = max_vol
 
+    @classmethod
+    def sound_files(cls):
+        """Paths of the sound files"""
+        return ["sound/%s.ogg" % fname for name, fname, max_vol in cls.sounds]
+
     def play(self, name):
         """Play a sound"""
         self._sounds[name].set_volume(self._sounds_max_vol[name])
@@ -0,0 +1,110 @@
+#
+# Spatial hash broadphase
+# Uniform grid over game coordinates, rebuilt each tick in one vectorized
+# pass. Answers radius and collision queries without comparing every pair
+# of bodies.
+#
+
+import math
+import numpy as np
+
+# neighbouring cells visited when looking for pairs: each pair of cells is
+# visited once
+_HALF_NEIGHBOURHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def _ranges(start, end):
+    """Concatenate the ranges [start, end), vectorized. Return the ranges
+    and, for each element, the index of the range it comes from
+    """
+    cnt = np.maximum(end - start, 0)
+    owner = np.repeat(np.arange(len(cnt)), cnt)
+    idx = np.repeat(start - (np.cumsum(cnt) - cnt), cnt) + \
+        np.arange(cnt.sum())
+    return idx, owner
+
+
+class SpatialHash(object):
+    """Uniform grid of square cells. Points are sorted by cell, each
+    occupied cell covers a contiguous range of the sorted points.
+    """
+    def __init__(self, cell_size=16.):
+        self.cell_size = float(cell_size)
+        self.build(np.zeros((0, 2)))
+
+    def __len__(self):
+        return len(self.pos)
+
+    def _cell_keys(self, cx, cy):
+        """Combine cell coordinates into a single sortable key"""
+        return (cx.astype(np.int64) << 32) + cy.astype(np.int64)
+
+    def build(self, pos, ids=None):
+        """Index points. ids are returned by the queries instead of the
+        point indexes, if given
+        """
+        pos = np.asarray(pos, dtype=float).reshape(-1, 2)
+        cells = np.floor(pos / self.cell_size).astype(np.int64)
+        keys = self._cell_keys(cells[:, 0], cells[:, 1])
+        order = np.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        self.pos = pos[order]
+        self.cells = cells[order]
+        self.ids = order if ids is None else np.asarray(ids)[order]
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) \
+            if len(keys) else np.zeros(0, dtype=np.int64)
+        self._keys = keys[first]
+        self._start = first
+        self._end = np.r_[first[1:], len(keys)].astype(np.int64)
+
+    def _lookup(self, keys):
+        """Sorted point range [start, end) of each cell key"""
+        if not len(self._keys):
+            none = np.zeros(len(keys), dtype=np.int64)
+            return none, none
+        i = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        found = self._keys[i] == keys
+        return np.where(found, self._start[i], 0), \
+            np.where(found, self._end[i], 0)
+
+    def query_radius(self, point, radius):
+        """ids of the points closer than radius to point"""
+        if not len(self.pos):
+            return self.ids[:0]
+        c = self.cell_size
+        x0, y0 = int(math.floor((point[0] - radius) / c)), \
+            int(math.floor((point[1] - radius) / c))
+        x1, y1 = int(math.floor((point[0] + radius) / c)), \
+            int(math.floor((point[1] + radius) / c))
+        cx, cy = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        idx, _ = _ranges(*self._lookup(self._cell_keys(cx.ravel(),
+            cy.ravel())))
+        d = self.pos[idx] - point
+        return self.ids[idx[(d * d).sum(axis=1) < radius ** 2]]
+
+    def pairs(self, radius):
+        """All pairs of points closer than radius, as two arrays of ids.
+        radius must not exceed the cell size
+        """
+        assert radius <= self.cell_size, "Radius larger than cell size"
+        n = len(self.pos)
+        empty = self.ids[:0]
+        if n < 2:
+            return empty, empty
+
+        ii, jj = [], []
+        for dx, dy in _HALF_NEIGHBOURHOOD:
+            start, end = self._lookup(self._cell_keys(self.cells[:, 0] + dx,
+                self.cells[:, 1] + dy))
+            if dx == dy == 0:
+                # same cell: only pair with the following points
+                start = np.arange(1, n + 1)
+            j, i = _ranges(start, end)
+            ii.append(i)
+            jj.append(j)
+
+        i = np.concatenate(ii)
+        j = np.concatenate(jj)
+        d = self.pos[i] - self.pos[j]
+        close = (d * d).sum(axis=1) < radius ** 2
+        return self.ids[i[close]], self.ids[j[close]]
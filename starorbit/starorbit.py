@@ -16,27 +16,39 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import OrderedDict
 from gloss import Gloss, GlossGame
 from optparse import OptionParser
 from pygame.locals import *
 from time import time
-from threading import Thread
 import gloss
 import math
+import numpy as np
 import pygame
 import random
 import sys
 
-from units import degrees, radians, seconds, degrees_per_sec
-from vectors import Vector, PVector
+from units import degrees, radians, seconds, degrees_per_sec, opposite, \
+    to_radians
+from vectors import Vector, PVector, VectorArray, PVectorArray
+from physics import G, BodyStore
+from barneshut import BarnesHutGravity
+from integrators import INTEGRATORS, get_integrator
+from kepler import predict_orbit
+from prediction import OrbitPredictionJob
+from orbitcache import OrbitCache
+from camera import Camera
 from sound import SoundPlayer
+from assets import build_bundle, load_bundle
+from loader import AssetLoader
 
 game = None
 SAT_L = 0
-G = 10.125
 
 class GVector(Vector):
     """2D vector, measured in game units"""
+    __slots__ = ()
+
     @property
     def pvector(self):
         """Equivalent vector measured in pixes"""
@@ -46,20 +58,21 @@ class GVector(Vector):
         """The Point/Vector behaves as a tuple, mostly for interacting with pygame.
         Return integers measured in pixels
         """
-        return int(self.tup[i] * game.zoom)
+        return int((self.x, self.y)[i] * game.zoom)
 
     @property
     def in_pixels(self):
         """Equivalent vector measured in pixes"""
-        scaled = self * game.zoom
-        return PVector(scaled.tup)
+        zoom = game.zoom
+        return PVector._new(self.x * zoom, self.y * zoom)
 
     @property
     def on_screen(self):
         """Equivalent vector measured in pixels, shifted based on the camera
         offset and the screen center
         """
-        return self.pvector - game.gcamera.pvector + game._screen_center
+        x, y = game.camera.to_screen(self.x, self.y)
+        return PVector._new(x, y)
 
     def __repr__(self):
         return "GVector {%.3f, %.3f}" % (self.x, self.y)
@@ -69,12 +82,102 @@ class SVector(Vector):
     """2D vector, as it appears on the screen
     e.g. SVector(0, 0) is always the topleft corner of the screen
     """
+    __slots__ = ()
+
     @property
     def gvector(self):
         """Equivalent GVector"""
-        pv = PVector(*self.tup) - game._screen_center + game.gcamera.pvector
-        gv = pv / game.zoom
-        return GVector(*gv.tup)
+        x, y = game.camera.to_world(self.x, self.y)
+        return GVector._new(x, y)
+
+
+class GVectorArray(VectorArray):
+    """Array of 2D vectors, measured in game units"""
+    vector_type = GVector
+
+    @property
+    def in_pixels(self):
+        """Equivalent vectors measured in pixels"""
+        return PVectorArray._new(self.a * game.zoom)
+
+    @property
+    def on_screen(self):
+        """Equivalent vectors measured in pixels, shifted based on the
+        camera offset and the screen center
+        """
+        return PVectorArray._new(game.camera.to_screen_array(self.a))
+
+
+def load_texture(fname):
+    """Return the region of the game atlas of a texture, or the texture
+    shared through the game registry. Nothing is loaded when running
+    headless
+    """
+    if game.headless:
+        return None
+    if game.atlas is not None and fname in game.atlas:
+        return game.atlas[fname]
+    return game.textures.get(fname)
+
+
+def decode_texture(fname):
+    """Decode an image file into texture data (see gloss.Texture.prepare).
+    Return None if it cannot be loaded, the error is reported when the
+    texture is used
+    """
+    try:
+        return gloss.Texture.prepare(pygame.image.load(fname))
+    except (pygame.error, IOError):
+        return None
+
+
+def render_atlas(loader, max_size):
+    """Pack the ATLAS_FILES images loaded by an AssetLoader, and the
+    levels of detail of LOD_FILES
+    """
+    return gloss.TextureAtlas.render(
+        [(fname, loader.get(fname)) for fname in ATLAS_FILES], 1, max_size,
+        LOD_FILES)
+
+
+# images packed in a single texture atlas: sprites and particles drawn every
+# frame
+ATLAS_FILES = (
+    'art/blue_sun.png',
+    'art/circle_cyan.png',
+    'art/red_dot.png',
+    'art/shuttle.png',
+    'art/shuttle_light_b.png',
+    'art/shuttle_light_l.png',
+    'art/shuttle_light_r.png',
+    'art/shuttle_light_t.png',
+    'art/space_planet.png',
+    'fire.png',
+    'smoke.tga',
+)
+
+# atlas images drawn much smaller than their size: halved copies are packed
+# too, and sprites use the one matching their size on screen
+LOD_FILES = (
+    'art/blue_sun.png',
+    'art/shuttle.png',
+    'art/shuttle_light_b.png',
+    'art/shuttle_light_l.png',
+    'art/shuttle_light_r.png',
+    'art/shuttle_light_t.png',
+    'art/space_planet.png',
+)
+
+# other textures and images, stored with ATLAS_FILES and the sounds in the
+# asset bundle by --build-assets
+TEXTURE_FILES = (
+    'art/loading.png',
+    'space_tileable.png',
+)
+IMAGE_FILES = (
+    'space_dim.jpg',
+)
+BUNDLE_FILE = 'assets.bundle'
 
 
 def distance(a, b):
@@ -90,9 +193,14 @@ class VectorDisplay(object):
 
     def show(self, start, end=None, vec=None):
         """Display a cross or a vector between two points"""
-        if end:
+        if end is not None:
             vec = end - start
-        self._items.append((start, vec, time()))
+        if vec is not None:
+            nodes, rgb = self._vector_nodes(start, vec), (0, 1, 1)
+        else:
+            nodes, rgb = self._cross + start, (1, 1, 0)
+        # the lines are kept in game units, the camera is applied when drawn
+        self._items.append((gloss.LineMesh(nodes.a), rgb, time()))
 
     def draw(self):
         """Draw items"""
@@ -100,52 +208,27 @@ class VectorDisplay(object):
             return
 
         newitems = []
-        for start, end, tstamp in self._items:
+        for mesh, rgb, tstamp in self._items:
             tdelta = time() - tstamp
             if tdelta <= 1:
                 alpha = (1 - tdelta)
-                newitems.append((start, end, tstamp))
-                if end:
-                    self._plot_vector(start, end, alpha)
-                else:
-                    self._plot_cross(start, alpha)
+                newitems.append((mesh, rgb, tstamp))
+                mesh.draw(game.camera.matrix,
+                    color=gloss.Color(*(rgb + (alpha, ))), width=1)
 
         self._items = newitems
 
-    def _plot_vector(self, start, arrow, alpha=.5):
-        """Plot a vector on the screen, applied to a starting position"""
-        arrow *= 100
+    def _vector_nodes(self, start, arrow):
+        """Lines of a vector applied to a starting position"""
+        arrow = arrow * 100
         end = start + arrow
         tip_r = arrow.orthonormal() - arrow.normalized()
         tip_l = arrow.orthonormal() * -1  - arrow.normalized()
         tip_r += end
         tip_l += end
-        e = end.on_screen
-        gloss.Gloss.draw_lines(
-            [start.on_screen, e, tip_r.on_screen, e, tip_l.on_screen],
-            color=gloss.Color(0, 1, 1, alpha),
-            width=1,
-            join=False
-        )
+        return GVectorArray([start, end, tip_r, end, tip_l])
 
-
-    def _plot_cross(self, start, alpha=.1):
-        """Plot a cross on the screen"""
-        size = 4
-        nodes = (
-            start,
-            start + GVector(size, 0),
-            start + GVector(-size, 0),
-            start,
-            start + GVector(0, size),
-            start + GVector(0, -size),
-        )
-        gloss.Gloss.draw_lines(
-            [n.on_screen for n in nodes],
-            color=gloss.Color(1, 1, 0, alpha),
-            width=1,
-            join=False
-        )
+    _cross = GVectorArray([(0, 0), (4, 0), (-4, 0), (0, 0), (0, 4), (0, -4)])
 
 
 class MutePlayer(object):
@@ -160,17 +243,34 @@ class MutePlayer(object):
 class Sprite(gloss.Sprite):
     def __init__(self, fname, raw_scale):
         self._angle = 0
-        gloss.Sprite.__init__(self, gloss.Texture(fname))
+        gloss.Sprite.__init__(self, load_texture(fname))
         self._raw_scale = raw_scale
         self._raw_rotation = 0.0
 
+    _screen_key = None
+
     def _recenter(self):
-        """Update sprite rect based on screen offset and image size"""
-        self.move_to(*self.gcenter.on_screen)
+        """Update sprite rect based on screen offset and image size.
+        Nothing to do unless the sprite or the camera moved
+        """
+        gc = self.gcenter
+        key = (gc.x, gc.y, game.camera.version)
+        if key != self._screen_key:
+            self._screen_key = key
+            self.move_to(*gc.on_screen)
 
     def update(self):
         self._recenter()
 
+    def screen_bounds(self):
+        """Screen rectangle (left, top, right, bottom) containing the sprite
+        in any rotation
+        """
+        t = self.texture
+        r = math.hypot(t.width, t.height) / 2 * self._raw_scale * game.zoom
+        x, y = self.position
+        return x - r, y - r, x + r, y + r
+
     def draw(self):
         """Draw on screen"""
         angle = getattr(self, '_angle', 0.0)
@@ -183,13 +283,16 @@ class Orbit(object):
     def __init__(self):
         self.gcenter = GVector(0, 0)
         self._orbit = ()
+        # the points in game units, uploaded when they change
+        self._mesh = gloss.LineMesh()
         self._color = gloss.Color(1, 1, 1, .2)
         self._alpha_animator = animator_directional(maxv=.2, step=.01)
         self._alpha_animator.next()
 
     def fade_in(self, orbit):
-        """Start fading in a new orbit"""
-        self._orbit = [o[0] for o in orbit]
+        """Start fading in a new orbit, given as a GVectorArray"""
+        self._orbit = orbit
+        self._mesh.set_points(orbit.a)
         self._fading = 'in'
         self._alpha_animator.send('up')
 
@@ -204,16 +307,11 @@ class Orbit(object):
 
     def draw(self):
         """Draw orbit"""
-        if not self._orbit:
+        if not len(self._orbit):
             return
 
-        p_orbit = [o.on_screen for o in self._orbit]
-        gloss.Gloss.draw_lines(
-            p_orbit,
-            color=self._color,
-            width=game.zoom * 1,
-            join=False
-        )
+        self._mesh.draw(game.camera.matrix, color=self._color,
+            width=game.zoom * 1)
 
 
 class BlackBackground(object):
@@ -247,13 +345,22 @@ class Background(Sprite):
 
 
 class Tiles(object):
-    """Manage tiled sprites
+    """Manage tiled sprites. Only the tiles covering the screen are drawn,
+    tiles that scroll off screen are kept in a bounded LRU cache
     """
-    # each title is located by a (x, y) tuple in self._tiles
-    # The central tile is at (0, 0)
-    def __init__(self):
-        self._tiles = {}
+    # each tile is located by a (x, y) tuple. The central tile is at (0, 0)
+    # and, as the sprites are drawn centered, tile (x, y) covers
+    # [x - .5, x + .5) tile widths
+    cache_size = 64
+
+    def __init__(self, margin=0):
+        """Tiles cover the screen and margin pixels around it"""
+        self.margin = margin
+        self._tiles = {} # displayed tiles
+        self._cache = OrderedDict() # off screen tiles, least recent first
+        self._camera_version = None
         self._basetile = Background()
+        self.created = 0
 
     def _locate_tile(self, sv):
         """Given a point (in pixels on screen), locate the tile that contains
@@ -262,8 +369,8 @@ class Tiles(object):
         gv = sv.gvector
         tile_width = self._basetile.texture.width
         tile_height = self._basetile.texture.height
-        x = int(gv.x / tile_width)
-        y = int(gv.y / tile_height)
+        x = int((gv.x + tile_width / 2.) // tile_width)
+        y = int((gv.y + tile_height / 2.) // tile_height)
         return (x, y)
 
     def _get_tile_center(self, x, y):
@@ -273,22 +380,42 @@ class Tiles(object):
         tile_height = self._basetile.texture.height
         return GVector(tile_width * x, tile_height * y)
 
+    def _get_tile(self, key):
+        """Get a tile from the cache or create it"""
+        tile = self._cache.pop(key, None)
+        if tile is None:
+            tile = self._get_tile_center(*key)
+            self.created += 1
+        return tile
+
     def _find_displayed_tiles(self):
-        """Find tiles that are currently visible
+        """Find tiles that are currently visible, cache the others
         """
-        s_topleft = SVector(0, 0)
-        s_bottomright = SVector(*game.resolution)
+        m = self.margin
+        s_topleft = SVector(-m, -m)
+        s_bottomright = SVector(game.resolution.x + m, game.resolution.y + m)
         ti_topleft = self._locate_tile(s_topleft)
         ti_bottomright = self._locate_tile(s_bottomright)
 
+        tiles = {}
         for x in xrange(ti_topleft[0], ti_bottomright[0] + 1):
             for y in xrange(ti_topleft[1], ti_bottomright[1] + 1):
-                if (x, y) not in self._tiles:
-                    self._tiles[(x, y)] = self._get_tile_center(x, y)
-                    #print ti_topleft, ti_bottomright, x,y, self._tiles[(x,y)]
+                tile = self._tiles.pop((x, y), None)
+                if tile is None:
+                    tile = self._get_tile((x, y))
+                tiles[(x, y)] = tile
+
+        for key, tile in self._tiles.iteritems():
+            self._cache[key] = tile
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        self._tiles = tiles
 
     def update(self):
-        self._find_displayed_tiles()
+        """Update the displayed tiles when the camera moved"""
+        if self._camera_version != game.camera.version:
+            self._camera_version = game.camera.version
+            self._find_displayed_tiles()
 
     def draw(self):
         """Draw displayed tiles"""
@@ -296,6 +423,59 @@ class Tiles(object):
             self._basetile.draw(gc)
 
 
+class StaticLayers(object):
+    """The layers that only change with the zoom and the suns, rendered
+    once on black into a gloss.RenderTarget and drawn as a single quad.
+    The composite covers the screen and a margin around it: while the
+    camera pans by less than the margin it is drawn shifted, otherwise it
+    is rendered again
+    """
+    layers = ('_background_tiles', '_suns')
+    margin = 128 # pixels
+
+    def __init__(self):
+        self._target = None
+        self._key = None
+        self._offset = None # camera offset when rendered
+        self.hits = 0
+        self.misses = 0
+
+    def _render(self):
+        """Render the layers into the target"""
+        m = self.margin
+        size = (int(game.resolution.x) + 2 * m, int(game.resolution.y) + 2 * m)
+        if self._target is None or \
+                (self._target.width, self._target.height) != size:
+            self._target = gloss.RenderTarget(*size, floating_point=False)
+        self._target.activate(origin=(-m, -m))
+        Gloss.clear(gloss.Color.BLACK)
+        for l in self.layers:
+            items = getattr(game, l)
+            if isinstance(items, list):
+                [i.draw() for i in items]
+            else:
+                items.draw()
+        self._target.deactivate()
+
+    def draw(self):
+        """Draw the composite, rendering it first if it is out of date"""
+        key = (game.zoom, game.resolution.tup,
+            tuple(s.gcenter.tup for s in game._suns))
+        ox, oy = game.camera.to_screen(0, 0)
+        dx = int(round(ox - self._offset[0])) if self._offset else 0
+        dy = int(round(oy - self._offset[1])) if self._offset else 0
+        if key == self._key and abs(dx) <= self.margin and \
+                abs(dy) <= self.margin:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._render()
+            self._key = key
+            self._offset = ox, oy
+            dx = dy = 0
+        self._target.draw((dx - self.margin, dy - self.margin), blend=False)
+
+
 class BlackOverlay(object):
     """Black overlay used to fade to black"""
     def __init__(self):
@@ -348,69 +528,58 @@ class Satellite(Sprite):
         Sprite.__init__(self, 'art/blue_sun.png', .01)
         x = random.randint(-300, 300)
         y = random.randint(-300, 300)
-        self.gcenter = GVector(x, y)
-        self.gspeed = GVector(.5, 0)
+        self._attach_body(GVector(x, y), GVector(.5, 0), .001)
         self.rect = pygame.Rect(self.gcenter.tup, (10, 10))
-        self.mass = .001
         self.orbit = ()
 
-    def place_in_orbit(self, planet):
-        """Place object in orbit against a planet"""
-        d = self.gcenter.distance(planet.gcenter)
-        v = math.sqrt((G * planet.mass ** 2) / ((self.mass + planet.mass) * d))
-        self.gspeed = self.gspeed.orthonormal(planet.gcenter)
-        self.gspeed.modulo = v
-
     def update(self):
-        """Move satellite"""
-        self.gspeed += self._calculate_acceleration(self.gcenter, self.mass)
-        self.gcenter += self.gspeed * game.speed
-        if self._collision_with_suns(self.gcenter):
-            game.create_explosion(self.gcenter, self)
-        self._recenter()
+        """Satellites are moved on screen by Game._recenter_satellites"""
+        pass
 
-    def _collision_with_suns(self, center, thresh=15):
-        for sun in game._suns:
-            if center.distance(sun.gcenter) < thresh:
-                return True
-        return False
+    def _attach_body(self, gcenter, gspeed, mass, attracts=True):
+        """Allocate the body state in the game BodyStore"""
+        self._bodies = game._bodies
+        self._slot = self._bodies.add(gcenter.tup, gspeed.tup, mass, self,
+            attracts)
 
-    def _calculate_acceleration(self, center, mass, step=1):
-        """Calculate gravitational acceleration relative to suns"""
-        acceleration_v = GVector(0, 0)
-        for sun in game._suns:
-            distance = center.distance(sun.gcenter)
-            dist_normal = center.normalized(sun.gcenter)
-            force = G * (mass * sun.mass)/(distance ** 2) * step
-            acceleration_v += dist_normal * force / mass
+    def _detach_body(self):
+        """Release the body state"""
+        self._bodies.remove(self._slot)
 
-        return acceleration_v
+    # position, speed and mass are views over the BodyStore
+    @property
+    def gcenter(self):
+        x, y = self._bodies.pos[self._slot]
+        return GVector(float(x), float(y))
 
-    def _predict_orbit_chunk(self):
-        """Predict object orbit"""
-        if len(self.orbit) == 0:
-            self.orbit = [(self.gcenter, self.gspeed)]
+    @gcenter.setter
+    def gcenter(self, v):
+        self._bodies.pos[self._slot] = v.tup
 
-        initial_gcenter = self.orbit[0][0]
-        gcenter, gspeed = self.orbit[-1]
+    @property
+    def gspeed(self):
+        x, y = self._bodies.vel[self._slot]
+        return GVector(float(x), float(y))
 
-        for x in xrange(100):
-            gspeed += self._calculate_acceleration(gcenter, self.mass)
-            gcenter += gspeed
+    @gspeed.setter
+    def gspeed(self, v):
+        self._bodies.vel[self._slot] = v.tup
 
-            if len(self.orbit) > 10:
-                if gcenter.distance(initial_gcenter) < 6:
-                    self.orbit.append((gcenter, gspeed))
-                    self._orbit_prediction_running = False
-                    game.orbit.fade_in(self.orbit)
-                    return
+    @property
+    def mass(self):
+        return float(self._bodies.mass[self._slot])
 
-            if gcenter.distance(self.orbit[-1][0]) > 5:
-                self.orbit.append((gcenter, gspeed))
-                if len(self.orbit) > 500:
-                    self._orbit_prediction_running = False
-                    game.orbit.fade_in(self.orbit)
-                    return
+    @mass.setter
+    def mass(self, m):
+        self._bodies.mass[self._slot] = m
+
+    def place_in_orbit(self, planet):
+        """Place object in orbit against a planet"""
+        d = self.gcenter.distance(planet.gcenter)
+        v = math.sqrt((G * planet.mass ** 2) / ((self.mass + planet.mass) * d))
+        gspeed = self.gspeed.orthonormal(planet.gcenter)
+        gspeed.modulo = v
+        self.gspeed = gspeed
 
 
 class Sun(Sprite):
@@ -425,7 +594,7 @@ class Sun(Sprite):
 
 class Starship(Satellite):
     def __init__(self, gcenter):
-        gloss.Sprite.__init__(self, gloss.Texture('art/shuttle.png'))
+        gloss.Sprite.__init__(self, load_texture('art/shuttle.png'))
         self._angle = degrees(0)
         self._target_angle = degrees(0)
         self._angular_velocity = degrees_per_sec(0)
@@ -434,9 +603,9 @@ class Starship(Satellite):
         self._raw_scale = .025
         self._raw_scale = .015 # fixme
         self._tp = None
-        self.gcenter = gcenter
-        self.gspeed = GVector(0, -0.3)
-        self.mass = 4
+        # the ship is as heavy as a sun for its own orbit, but must not pull
+        # the satellites around like one
+        self._attach_body(gcenter, GVector(0, -0.3), 4, attracts=False)
         self.orbit = ()
         self.propellent = 1500
         self.hull_temperature = 0
@@ -456,12 +625,10 @@ class Starship(Satellite):
         self.hull_temperature += dt
 
     def update(self):
-        """Plot orbit, move ship"""
+        """Plot orbit, rotate ship. The ship is moved by Game._step_bodies"""
         if self._orbit_prediction_running:
-            self._predict_orbit_chunk()
+            self._collect_orbit_prediction()
 
-        self.gspeed += self._calculate_acceleration(self.gcenter, self.mass)
-        self.gcenter += self.gspeed * game.speed
         self._rotate()
         self._update_temperature()
         self._recenter()
@@ -478,26 +645,77 @@ class Starship(Satellite):
         #game.vdebugger.show(self.gcenter, vec=thrust)
 
 
+    def place_in_orbit(self, planet):
+        """Place ship in orbit against a planet"""
+        Satellite.place_in_orbit(self, planet)
+        self._start_orbit_prediction()
+
     def _start_orbit_prediction(self):
+        """Predict the orbit in closed form when a single sun dominates,
+        otherwise start the numerical prediction
+        """
         game.orbit.fade_out()
-        self._orbit_prediction_running = True
-        self.orbit = []
+        if self._orbit_prediction_thread:
+            # drop any stale prediction
+            self._orbit_prediction_thread.cancel()
+            self._orbit_prediction_thread = None
+
+        sun_pos, sun_mass = game._sun_arrays()
+        state = (self.gcenter.tup, self.gspeed.tup, sun_pos, sun_mass)
+        points = game.orbit_cache.get(*state)
+        if points is None:
+            points = predict_orbit(*state)
+            if points is not None:
+                game.orbit_cache.put(*state + (points, ))
+
+        if points is None:
+            self._orbit_prediction_running = True
+            self._orbit_prediction_state = state
+            self.orbit = [self.gcenter.tup]
+            self._orbit_prediction_thread = OrbitPredictionJob(
+                *state + (game.new_integrator(), ))
+            self._orbit_prediction_thread.start()
+            return
+
+        self._orbit_prediction_running = False
+        self.orbit = ()
+        game.orbit.fade_in(GVectorArray(points))
+
+    def _collect_orbit_prediction(self):
+        """Show the orbit points streamed so far by the prediction thread"""
+        job = self._orbit_prediction_thread
+        received = False
+        while not job.points.empty():
+            chunk = job.points.get()
+            if chunk is None:
+                self._orbit_prediction_running = False
+                self._orbit_prediction_thread = None
+                game.orbit_cache.put(*self._orbit_prediction_state +
+                    (self.orbit, ))
+                break
+            self.orbit.extend(chunk)
+            received = True
+
+        if received:
+            game.orbit.fade_in(GVectorArray(self.orbit))
 
     def set_target_angle(self, vector):
         """Set ship target angle. Side thrusters will be engaged to
         rotate it
         """
-        self._target_angle = vector.angle_cw_degs.opposite
+        self._target_angle = opposite(vector.angle_cw_degs)
 
     def _rotate(self):
         """Control yaw Reaction control system
         based on angle, angular velocity and target angle
         """
         #TODO deltat
-        self._angle += self._angular_velocity * seconds(1)
+        # plain float angles do not wrap around, see units.py
+        self._angle = degrees(
+            (self._angle + self._angular_velocity * seconds(1)) % 360)
         self.yaw_rcs_status = ''
 
-        signed_delta = float(self._target_angle - self._angle)
+        signed_delta = float(self._target_angle - self._angle) % 360
         # signed_delta is defined between -180 and 180
         if signed_delta > 180:
             signed_delta -= 360
@@ -535,9 +753,10 @@ class Starship(Satellite):
         game.soundplayer.play('gear')
 
 
-class ShipReflex(Satellite):
+class ShipReflex(Sprite):
     def __init__(self, ship, n, light_angle):
-        gloss.Sprite.__init__(self, gloss.Texture('art/shuttle_light_%s.png' % n))
+        gloss.Sprite.__init__(self,
+            load_texture('art/shuttle_light_%s.png' % n))
         self._ship = ship
         self.gspeed = ship.gspeed
         self.gcenter = ship.gcenter
@@ -553,7 +772,7 @@ class ShipReflex(Satellite):
         self._recenter()
 
         mydir = GVector(1, 0)
-        mydir.angle = (self._light_angle - self._angle).radians
+        mydir.angle = to_radians(self._light_angle - self._angle)
 
         for sun in game._suns:
             light = self.gcenter - sun.gcenter
@@ -584,13 +803,19 @@ class PSystem(object):
     def draw(self):
         self._ps.draw()
 
+    def screen_bounds(self):
+        """Screen rectangle containing the particles, None if there are
+        none
+        """
+        return self._ps.bounds()
+
     def update(self):
         pass
 
 
 class Explosion(PSystem):
     def __init__(self, pcenter):
-        self._texture= gloss.Texture("fire.png")
+        self._texture = load_texture("fire.png")
         self._ps = gloss.ParticleSystem(
             self._texture,
             onfinish = self._finished,
@@ -608,8 +833,7 @@ class Explosion(PSystem):
 
 class Debris(PSystem):
     def __init__(self, gcenter):
-        texture = pygame.Surface(size=(1,1))
-        texture = gloss.Texture("art/red_dot.png")
+        texture = load_texture("art/red_dot.png")
         wind = gcenter - game._suns[0].gcenter
         wind.modulo = 200
         self._ps = gloss.ParticleSystem(
@@ -632,7 +856,7 @@ class Debris(PSystem):
 class Thruster(PSystem):
     def __init__(self, gcenter, thrust):
         self.gcenter = gcenter
-        tex = gloss.Texture("smoke.tga")
+        tex = load_texture("smoke.tga")
 
         wind = PVector(game.zoom * 48, 0)
         wind.angle_cw_degs = degrees(180) - thrust.angle_cw_degs
@@ -660,7 +884,7 @@ class RCSThruster(PSystem):
     """Propellent particles from the RCS nozzles"""
     def __init__(self, ship, cw=True):
         self.gcenter = ship.gcenter
-        self._tex = gloss.Texture("smoke.tga")
+        self._tex = load_texture("smoke.tga")
         self._ps = [] # Running particle systems
 
         # Distance of the RCS thrusters from the ship center
@@ -705,6 +929,14 @@ class RCSThruster(PSystem):
         for ps in self._ps:
             ps.draw()
 
+    def screen_bounds(self):
+        """Screen rectangle containing the particles of all the systems"""
+        bounds = [b for b in (ps.bounds() for ps in self._ps) if b is not None]
+        if not bounds:
+            return None
+        left, top, right, bottom = zip(*bounds)
+        return min(left), min(top), max(right), max(bottom)
+
 class Bar(object):
     """Basic display Bar class"""
     def update(self):
@@ -915,29 +1147,48 @@ class Menu(object):
 
 
 class Game(gloss.GlossGame):
+    headless = False
+    # gloss.TextureAtlas of ATLAS_FILES and gloss.TextureRegistry of the
+    # other textures, used by load_texture
+    atlas = None
+    textures = None
+    # memory-mapped assets.AssetBundle, None to load the asset files
+    assets = None
+    # draw sprites and particles through a gloss.SpriteBatch
+    batch_sprites = True
+    sprite_batch = None
+    # layers whose items are not drawn when off screen, and per frame
+    # counts of their items drawn and culled
+    culled_layers = ('_suns', '_satellites', '_particles', '_circles',
+        '_ship_reflexes')
+    drawn_count = 0
+    culled_count = 0
+    # draw the background tiles and the suns from a cached composite, see
+    # StaticLayers
+    cache_static_layers = True
+    static_layers = None
+
     def __init__(self, fullscreen=False, resolution=None, display_fps=False,
-        sound=True):
+        sound=True, satellites=10, theta=None, integrator='leapfrog'):
         """Initialize Game"""
         gloss.GlossGame.__init__(self, 'Satellife')
         pygame.init()
         pygame.display.set_caption('Game')
+        self.assets = load_bundle(BUNDLE_FILE)
         if fullscreen:
             self._set_fullscreen()
         else:
             self._change_resolution(resolution)
-        self._screen_center = self.resolution / 2
+        self.camera = Camera(self.resolution / 2)
+        self.textures = gloss.TextureRegistry(load=self._load_file_texture)
+        self._decoded_textures = {} # by load_content, for the registry
         self._display_fps = display_fps
-        self.speed = 1
-        self.zoom = 1
         self._zoom_level = 3.9
-        self.changed_scale = True
-        self.gcamera = GVector(0, 0)
+        self._init_simulation(satellites, theta, integrator)
 
-        # load sounds
-        if sound:
-            self.soundplayer = SoundPlayer()
-        else:
-            self.soundplayer = MutePlayer()
+        # sounds are loaded by load_content
+        self._sound = sound
+        self.soundplayer = MutePlayer()
 
         # event handlers
         self.on_mouse_down = self._mouse_click
@@ -947,10 +1198,98 @@ class Game(gloss.GlossGame):
         self._menu = Menu(self)
         self.vdebugger = VectorDisplay()
 
-    def draw_loading_screen(self):
-        """Display an intro image while loading sprites"""
-        s = gloss.Sprite(gloss.Texture('art/loading.png'))
+    # zoom, camera position and screen center are held by the camera
+    @property
+    def zoom(self):
+        return self.camera.zoom
+
+    @zoom.setter
+    def zoom(self, zoom):
+        self.camera.zoom = zoom
+
+    @property
+    def gcamera(self):
+        x, y = self.camera.target
+        return GVector._new(x, y)
+
+    @gcamera.setter
+    def gcamera(self, gv):
+        self.camera.target = (gv.x, gv.y)
+
+    @property
+    def _screen_center(self):
+        x, y = self.camera.screen_center
+        return PVector._new(x, y)
+
+    def _init_simulation(self, satellites, theta, integrator):
+        """Setup the simulation parameters"""
+        self.speed = 1
+        self._satellites_count = satellites
+        # Barnes-Hut opening angle, None for suns-only gravity
+        self._theta = theta
+        # the same integrator type drives the live simulation and orbit
+        # prediction; adaptive ones keep state, hence separate instances
+        self._integrator_name = integrator
+        self.integrator = self.new_integrator()
+        self.orbit_cache = OrbitCache()
+
+    def draw_loading_screen(self, progress=None):
+        """Display an intro image while loading sprites, and the loading
+        progress if given
+        """
+        s = gloss.Sprite(load_texture('art/loading.png'))
         gloss.Sprite.draw(s, scale=self.resolution.x / 800.0)
+        if progress is not None:
+            w, h = self.resolution.tup
+            gloss.Gloss.draw_box(position=(w * .2, h * .9),
+                width=w * .6 * progress, height=4,
+                color=gloss.Color(1, 1, 1, .6))
+
+    def _show_loading_progress(self, progress):
+        """Redraw the loading screen"""
+        pygame.event.pump()
+        self.draw_loading_screen(progress)
+        pygame.display.flip()
+
+    def _decode_assets(self):
+        """Decode the assets missing from the bundle on a thread pool,
+        showing the progress on the loading screen. Return the results by
+        file name, and the rendered atlas as 'atlas'. Uploading textures is
+        left to the main thread
+        """
+        assets = self.assets
+        loader = AssetLoader()
+        if assets is None or not assets.has_atlas():
+            for fname in ATLAS_FILES:
+                loader.add(fname, pygame.image.load, fname)
+            loader.add('atlas', render_atlas, loader,
+                min(Gloss.MaxTextureSize, 4096))
+        for fname in TEXTURE_FILES:
+            if fname not in self.textures and (assets is None or
+                    not assets.has_texture(fname)):
+                loader.add(fname, decode_texture, fname)
+        if self._sound:
+            for fname in SoundPlayer.sound_files():
+                if assets is None or not assets.has_sound(fname):
+                    loader.add(fname, pygame.mixer.Sound, fname)
+        return loader.wait(self._show_loading_progress)
+
+    def _load_image(self, fname):
+        """Load an image as a pygame surface, from the bundle if possible"""
+        if self.assets is not None and self.assets.has_image(fname):
+            return self.assets.image(fname)
+        return pygame.image.load(fname)
+
+    def _load_file_texture(self, fname):
+        """Load a texture for the registry, from the data decoded by
+        load_content or the bundle if possible
+        """
+        data = self._decoded_textures.pop(fname, None)
+        if data is not None:
+            return gloss.Texture.from_data(*data)
+        if self.assets is not None and self.assets.has_texture(fname):
+            return self.assets.texture(fname)
+        return gloss.Texture(fname)
 
     def _set_fullscreen(self):
         """Set fullscreen mode"""
@@ -959,10 +1298,9 @@ class Game(gloss.GlossGame):
             pygame.OPENGL)
         Gloss.full_screen = True
         self.resolution = PVector(surf.get_size())
-        self._background = pygame.image.load('space_dim.jpg')
+        self._background = self._load_image('space_dim.jpg')
         self._background = pygame.transform.smoothscale(self._background,
             self.resolution)
-        self.changed_scale = True
         self._presolution = PVector(self.resolution)
 
     def _change_resolution(self, resolution):
@@ -971,10 +1309,9 @@ class Game(gloss.GlossGame):
         Gloss.screen_resolution = resolution.tup
         self._display_s = pygame.display.set_mode(resolution,
             pygame.RESIZABLE | pygame.DOUBLEBUF | pygame.OPENGL)
-        self._background = pygame.image.load('space_dim.jpg')
+        self._background = self._load_image('space_dim.jpg')
         self._background = pygame.transform.smoothscale(self._background,
             resolution)
-        self.changed_scale = True #FIXME: remove changed_scale everywhere
         self._presolution = PVector(self.resolution)
 
     def _zoom_in(self):
@@ -1001,8 +1338,9 @@ class Game(gloss.GlossGame):
         # I have no idea what i'm doing
         zoom = 32 * math.atan(1/self._zoom_level)
         if self.zoom != zoom:
-            self.zoom += (zoom - self.zoom) / 10
-            self.changed_scale = True
+            step = (zoom - self.zoom) / 10
+            # snap once the steps are invisible, so that the zoom settles
+            self.zoom = zoom if abs(step) < 1e-4 else self.zoom + step
 
     def _impulse(self):
         """Fire thrusters for one impulse"""
@@ -1020,25 +1358,35 @@ class Game(gloss.GlossGame):
         else:
             pass #TODO: add error sound
 
-    def create_explosion(self, gcenter, victim):
-        self.kill_sprite(victim)
-        self._particles.append(Explosion(gcenter.on_screen))
+    def create_explosions(self, victims):
+        """Blow up satellites"""
+        gcenters = [victim.gcenter for victim in victims]
+        self.kill_sprites(victims)
+        for gcenter in gcenters:
+            self._particles.append(Explosion(gcenter.on_screen))
 
     def kill_sprite(self, victim):
-        for li in self._suns, self._satellites, self._particles, self._circles, [self._ship]:
-            for i in li:
-                if i == victim:
-                    li.remove(victim)
-                    return
+        self.kill_sprites([victim])
 
-        #FIXME raise RuntimeError, "Unable to kill %s" % repr(victim)
+    def kill_sprites(self, victims):
+        """Remove sprites from the game, with a single pass over each list:
+        thousands of satellites can collide in the same tick
+        """
+        victims = set(victims)
+        for name in ('_suns', '_satellites', '_particles', '_circles'):
+            items = getattr(self, name)
+            kept = [i for i in items if i not in victims]
+            if len(kept) != len(items):
+                setattr(self, name, kept)
+        for victim in victims:
+            if isinstance(victim, Satellite):
+                victim._detach_body()
 
     def _mouse_click(self, event):
         """Handle mouse clicks and wheel movement during game"""
         if not self._menu.mode == 'play':
             return
 
-        self.changed_scale = False
         if event.button == 4: # wheel up
             self._zoom_in()
         elif event.button == 5: # wheen down
@@ -1072,20 +1420,27 @@ class Game(gloss.GlossGame):
 
     def load_content(self):
         """Load images, create game objects"""
+        decoded = self._decode_assets()
+        if 'atlas' in decoded:
+            self.atlas = gloss.TextureAtlas.from_data(*decoded['atlas'])
+        else:
+            self.atlas = self.assets.atlas()
+        self._decoded_textures = dict((fname, decoded[fname])
+            for fname in TEXTURE_FILES if decoded.get(fname) is not None)
+        if self._sound:
+            self.soundplayer = SoundPlayer(self.assets, decoded)
         self._font = gloss.SpriteFont(
             '/usr/share/fonts/truetype/freefont/FreeSans.ttf', 10)
 
-        self._background_tiles = Tiles()
-        self.orbit = Orbit()
-        self._suns = [Sun(gcenter=GVector(100, -100)), ]
-        self._satellites = [Satellite() for x in xrange(10)]
-        for s in self._satellites:
-            s.place_in_orbit(self._suns[0])
+        if self.cache_static_layers:
+            self.static_layers = StaticLayers()
+            self._background_tiles = Tiles(margin=StaticLayers.margin)
+        else:
+            self._background_tiles = Tiles()
+        self._load_bodies()
         self._circles = [Circle(), ]
         self._circles = []
         self._particles = []
-        self._ship = Starship(GVector(-100, 100))
-        self._ship.place_in_orbit(self._suns[0])
         self._ship_reflexes = [ShipReflex(self._ship, n, angle)
             for n, angle in (
                 ('l', 90),
@@ -1103,6 +1458,22 @@ class Game(gloss.GlossGame):
         self._black_overlay.set_to_black()
         self._black_overlay.fade_in()
 
+    def _load_bodies(self):
+        """Create suns, satellites and ship"""
+        self.orbit = Orbit()
+        self._suns = [Sun(gcenter=GVector(100, -100)), ]
+        if self._theta is None:
+            gravity = None
+        else:
+            gravity = BarnesHutGravity(self._theta)
+        self._bodies = BodyStore(gravity=gravity, integrator=self.integrator)
+        self._satellites = [Satellite()
+            for x in xrange(self._satellites_count)]
+        for s in self._satellites:
+            s.place_in_orbit(self._suns[0])
+        self._ship = Starship(GVector(-100, 100))
+        self._ship.place_in_orbit(self._suns[0])
+
     def _add_solar_debris(self):
         """Add debris caused by sun"""
         if Gloss.tick_count % 10 != 0:
@@ -1110,10 +1481,65 @@ class Game(gloss.GlossGame):
         gc = self._ship.gcenter + self._ship.gspeed * (random.random() - 1) * 3 
         self._particles.append(Debris(gc))
 
+    def new_integrator(self):
+        """Create an instance of the selected integrator"""
+        return get_integrator(self._integrator_name)
+
+    def _sun_arrays(self):
+        """Positions and masses of the suns, as arrays"""
+        sun_pos = np.array([s.gcenter.tup for s in self._suns],
+            dtype=float).reshape(-1, 2)
+        sun_mass = np.array([s.mass for s in self._suns], dtype=float)
+        return sun_pos, sun_mass
+
+    def _step_bodies(self):
+        """Move satellites and ship with one vectorized gravity step"""
+        sun_pos, sun_mass = self._sun_arrays()
+        self._bodies.step(sun_pos, sun_mass, dt=self.speed)
+
+    def tick(self):
+        """Advance the simulation: move bodies, blow up the satellites that
+        collided. The ship ignores collisions
+        """
+        self._step_bodies()
+        owners = self._bodies.owners
+        victims = [owners[slot]
+            for slot in np.flatnonzero(self._bodies.collided)
+            if owners[slot] is not self._ship]
+        if victims:
+            self.create_explosions(victims)
+
+    def _on_screen(self, item):
+        """Check if the screen bounds of an item intersect the screen"""
+        bounds = item.screen_bounds()
+        if bounds is None:
+            return False
+        left, top, right, bottom = bounds
+        return right >= 0 and bottom >= 0 and \
+            left <= self.resolution.x and top <= self.resolution.y
+
+    def _cull(self, items):
+        """Return the items on screen, count the drawn and culled ones"""
+        visible = [i for i in items if self._on_screen(i)]
+        self.drawn_count += len(visible)
+        self.culled_count += len(items) - len(visible)
+        return visible
+
+    def _recenter_satellites(self):
+        """Move all the satellite sprites to their screen position at once"""
+        if not self._satellites:
+            return
+        slots = [s._slot for s in self._satellites]
+        screen = GVectorArray._new(self._bodies.pos[slots]).on_screen
+        # truncate to pixels, like Sprite._recenter
+        for s, (x, y) in zip(self._satellites, screen.a.astype(int).tolist()):
+            s.move_to(x, y)
+
     def draw(self):
         """Main game loop: update game objects, handle zoom and pan, finally
         draw to screen
         """
+        self.tick()
         self._update_zoom()
 
         k = min(1, self.zoom / 10)
@@ -1121,7 +1547,7 @@ class Game(gloss.GlossGame):
         self._background_tiles.update()
 
         self._add_solar_debris()
-        self.changed_scale = True
+        self._recenter_satellites()
         layers = (
             '_background_tiles',
             '_suns',
@@ -1143,13 +1569,27 @@ class Game(gloss.GlossGame):
             else:
                 items.update()
 
-        # draw all layers
+        # draw all layers. Textured quads are batched, each layer is drawn
+        # before the next one
+        if self.batch_sprites:
+            Gloss.begin_batch()
+        self.drawn_count = self.culled_count = 0
+        cached = self.static_layers is not None and not Gloss.picking
+        if cached:
+            self.static_layers.draw()
         for l in layers:
+            if cached and l in StaticLayers.layers:
+                continue
             items = getattr(self, l)
+            if l in self.culled_layers:
+                items = self._cull(items)
             if isinstance(items, list):
                 [i.draw() for i in items]
             else:
                 items.draw()
+            Gloss.flush_batch()
+        if self.batch_sprites:
+            self.sprite_batch = Gloss.end_batch()
 
         # draw dashboard text
         self._draw_bottom_right_text("%06.2f" % self._ship._angle, 50)
@@ -1181,6 +1621,44 @@ class Game(gloss.GlossGame):
         )
 
 
+class HeadlessGame(Game):
+    """Run the simulation with no display, Gloss or sound"""
+    headless = True
+
+    def __init__(self, satellites=10, theta=None, integrator='leapfrog',
+            resolution=None):
+        # a virtual screen, for the code that needs screen coordinates
+        self.resolution = resolution or PVector(800, 600)
+        self.camera = Camera(self.resolution / 2)
+        self._init_simulation(satellites, theta, integrator)
+
+    def load_content(self):
+        """Create game objects"""
+        self._load_bodies()
+        self._circles = []
+        self._particles = []
+
+    def create_explosions(self, victims):
+        self.kill_sprites(victims)
+
+    def run(self, ticks):
+        """Run the simulation as fast as possible, print statistics and
+        final state
+        """
+        self.load_content()
+        t0 = time()
+        for tick in xrange(ticks):
+            self.tick()
+        elapsed = time() - t0
+
+        print "%d ticks in %.3fs: %.1f ticks/s" % (ticks, elapsed,
+            ticks / elapsed)
+        print "ship: position %s speed %s" % (self._ship.gcenter,
+            self._ship.gspeed)
+        print "satellites: %d of %d left" % (len(self._satellites),
+            self._satellites_count)
+
+
 def parse_args():
     """Parse CLI args"""
     parser = OptionParser()
@@ -1192,6 +1670,22 @@ def parse_args():
         action="store_false", help="Disable sound", default=True)
     parser.add_option("-x", "--x-resolution", dest="resolution",
         help="resolution", default=800)
+    parser.add_option("-s", "--satellites", dest="satellites", type="int",
+        help="number of satellites", default=10)
+    parser.add_option("-m", "--mutual-gravity", dest="theta", type="float",
+        help="enable mutual attraction between bodies, using a Barnes-Hut " +
+        "tree with the given opening angle (e.g. 0.5)", default=None)
+    parser.add_option("-i", "--integrator", dest="integrator",
+        type="choice", choices=sorted(INTEGRATORS), default='leapfrog',
+        help="numerical integrator: %s" % ', '.join(sorted(INTEGRATORS)))
+    parser.add_option("--headless", dest="headless", action="store_true",
+        help="run the simulation only, with no display", default=False)
+    parser.add_option("--ticks", dest="ticks", type="int",
+        help="number of ticks to simulate in headless mode", default=1000)
+    parser.add_option("--build-assets", dest="build_assets",
+        action="store_true", default=False,
+        help="decode the game assets into %s, loaded at startup" %
+        BUNDLE_FILE)
 
     (options, args) = parser.parse_args()
     rx = options.resolution
@@ -1202,8 +1696,25 @@ def parse_args():
 def main():
     global game
     opts, args = parse_args()
+    if opts.build_assets:
+        pygame.mixer.init()
+        missing = build_bundle(BUNDLE_FILE, ATLAS_FILES, TEXTURE_FILES,
+            IMAGE_FILES, SoundPlayer.sound_files(), LOD_FILES)
+        for fname in missing:
+            print "Warning: %s not found, it will be loaded at runtime" % fname
+        print "%s written" % BUNDLE_FILE
+        return
+
+    if opts.headless:
+        game = HeadlessGame(satellites=opts.satellites, theta=opts.theta,
+            integrator=opts.integrator)
+        game.run(opts.ticks)
+        return
+
     game = Game(fullscreen=opts.fullscreen, resolution=opts.resolution,
-        display_fps=opts.framerate, sound=opts.sound)
+        display_fps=opts.framerate, sound=opts.sound,
+        satellites=opts.satellites, theta=opts.theta,
+        integrator=opts.integrator)
     game.run()
 
 if __name__ == '__main__':
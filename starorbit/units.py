@@ -1,10 +1,15 @@
 #
 # Physical units of measure
-# AssertionError(s) are raised when incompatible operations are executed
+# AssertionError(s) are raised when incompatible operations are executed.
+# The checks are done in debug runs only: when Python runs optimized (-O)
+# the units are plain floats, with no wrapping overhead. The conversion
+# functions at the bottom work in both modes, unlike the unit properties.
 #
 
 from math import pi
 
+CHECKED = __debug__
+
 class meters(float):
     def __add__(self, *args):
         assert isinstance(args[0], meters), \
@@ -30,7 +35,7 @@ class radians(float):
 
     @property
     def degrees(self):
-        return degrees(self * 180 / pi)
+        return to_degrees(self)
 
 
 class degrees(float):
@@ -46,11 +51,11 @@ class degrees(float):
 
     @property
     def radians(self):
-        return radians(self * pi / 180)
+        return to_radians(self)
 
     @property
     def opposite(self):
-        return self + degrees(180)
+        return opposite(self)
 
 
 class degrees_per_sec(float):
@@ -75,3 +80,20 @@ class degrees_per_sec(float):
 
 class seconds(float):
     pass
+
+
+if not CHECKED:
+    meters = radians = degrees = degrees_per_sec = seconds = float
+
+
+def to_radians(d):
+    """Convert degrees to radians"""
+    return radians(d * pi / 180)
+
+def to_degrees(r):
+    """Convert radians to degrees"""
+    return degrees(r * 180 / pi)
+
+def opposite(d):
+    """Opposite direction, in degrees between 0 and 360"""
+    return degrees((float(d) + 180) % 360)
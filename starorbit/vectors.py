@@ -1,49 +1,67 @@
 import math
-from units import meters, degrees, radians
+import numpy as np
+from units import meters, degrees, radians, to_radians
 
 class Vector(object):
-    """2D vector, with no specific unit value"""
+    """2D vector, with no specific unit value.
+    Subclasses must define __slots__ too, to stay free of an instance dict.
+    """
+    __slots__ = ('x', 'y')
 
     def __init__(self, x, y=None):
         """Point or vector"""
-        if isinstance(x, Vector):
-            self.tup = x.tup
+        if y is not None:
+            self.x = x
+            self.y = y
+
+        elif isinstance(x, Vector):
+            self.x = x.x
+            self.y = x.y
 
         elif isinstance(x, tuple):
             assert len(x) == 2
-            assert y is None, 'y cannot be set when the first param is a tuple'
-            self.tup = x
+            self.x, self.y = x
 
         else:
-            assert y is not None, 'y must be set'
-            self.tup = (x, y)
+            raise AssertionError('y must be set')
 
-    @property
-    def x(self):
-        return self.tup[0]
+    @classmethod
+    def _new(cls, x, y):
+        """Fast constructor, skipping the argument checks"""
+        v = object.__new__(cls)
+        v.x = x
+        v.y = y
+        return v
 
     @property
-    def y(self):
-        return self.tup[1]
+    def tup(self):
+        return (self.x, self.y)
+
+    @tup.setter
+    def tup(self, t):
+        self.x, self.y = t
 
     # act as a tuple
     def __len__(self):
-        return len(self.tup)
+        return 2
 
     def __getitem__(self, i):
         """The Vector behaves as a tuple, mostly for interacting with pygame.
         Return integers measured in pixels
         """
-        return int(self.tup[i])
+        return int((self.x, self.y)[i])
 
     def __add__(self, other):
         if type(self) == type(other):
-            return type(self)(self.x + other.x, self.y + other.y)
+            return self._new(self.x + other.x, self.y + other.y)
         raise(TypeError("Incompatible Vector types: %s %s" % (repr(self),
             repr(other))))
 
     def __sub__(self, other):
-        return self + (other * -1)
+        if type(self) == type(other):
+            return self._new(self.x - other.x, self.y - other.y)
+        raise(TypeError("Incompatible Vector types: %s %s" % (repr(self),
+            repr(other))))
 
     def __mul__(self, other):
         if type(self) == type(other):
@@ -51,12 +69,37 @@ class Vector(object):
             return self.x * other.x + self.y * other.y
         elif type(other) in (int, float):
             # scalar product
-            return type(self)(self.x * other, self.y * other)
+            return self._new(self.x * other, self.y * other)
         raise(TypeError("Incompatible Vector types"))
 
     def __div__(self, scalar):
         assert isinstance(scalar, (int, float)), "Integer or Float required."
-        return type(self)(self.x / scalar, self.y / scalar)
+        return self._new(self.x / scalar, self.y / scalar)
+
+    # in-place operators update the vector instead of building a new one:
+    # beware of vectors shared between objects
+    def __iadd__(self, other):
+        if type(self) == type(other):
+            self.x += other.x
+            self.y += other.y
+            return self
+        raise(TypeError("Incompatible Vector types: %s %s" % (repr(self),
+            repr(other))))
+
+    def __isub__(self, other):
+        if type(self) == type(other):
+            self.x -= other.x
+            self.y -= other.y
+            return self
+        raise(TypeError("Incompatible Vector types: %s %s" % (repr(self),
+            repr(other))))
+
+    def __imul__(self, other):
+        if type(other) in (int, float):
+            self.x *= other
+            self.y *= other
+            return self
+        return self * other
 
 
     # modulo attribute getter and setter
@@ -68,9 +111,8 @@ class Vector(object):
     def modulo(self, m):
         assert isinstance(m, (int, float)), "Integer or Float required."
         a = self.angle
-        x = math.sin(a) * m
-        y = math.cos(a) * m
-        self.tup = (x, y)
+        self.x = math.sin(a) * m
+        self.y = math.cos(a) * m
 
     # angle attribute getter and setter
     @property
@@ -87,9 +129,8 @@ class Vector(object):
     def angle(self, a):
         assert isinstance(a, radians), "Radians unit required."
         m = self.modulo
-        x = math.sin(a) * m
-        y = math.cos(a) * m
-        self.tup = (x, y)
+        self.x = math.sin(a) * m
+        self.y = math.cos(a) * m
 
     def angle_against(self, other):
         """Angle between two vectors"""
@@ -116,7 +157,7 @@ class Vector(object):
     def angle_cw_degs(self, a):
         """Set angle from CW degrees"""
         assert isinstance(a, degrees), "Degrees unit required."
-        self.angle = a.radians
+        self.angle = to_radians(a)
 
     def distance(self, other):
         assert type(self) == type(other), "Incompatible Vector types"
@@ -131,7 +172,7 @@ class Vector(object):
 
     def orthogonal(self):
         """Create an orthogonal vector"""
-        return type(self)(self.y, -1 * self.x)
+        return self._new(self.y, -1 * self.x)
 
     def orthonormal(self, other=None):
         """Create an orthogonal vector of length 1"""
@@ -139,11 +180,12 @@ class Vector(object):
         return v.orthogonal().normalized()
 
     def round_to_int(self):
-        self.tup = (int(self.x), int(self.y))
+        self.x = int(self.x)
+        self.y = int(self.y)
 
     @property
     def rounded(self):
-        return type(self)(int(self.x), int(self.y))
+        return self._new(int(self.x), int(self.y))
 
     def __repr__(self):
         return "Vector {%.3f, %.3f}" % (self.x, self.y)
@@ -151,16 +193,143 @@ class Vector(object):
     def set_polar(self, angle=None, modulo=None):
         if modulo == None:
             modulo = self.modulo
-        x = math.sin(angle) * modulo
-        y = math.cos(angle) * modulo
-        self.tup = (x, y)
+        self.x = math.sin(angle) * modulo
+        self.y = math.cos(angle) * modulo
 
 
 class PVector(Vector):
     """2D vector, measured in pixels"""
+    __slots__ = ()
+
     def __repr__(self):
         return "PVector {%.3f, %.3f}" % (self.x, self.y)
 
     @property
     def round_tup(self):
         return (int(self.x), int(self.y))
+
+
+class VectorArray(object):
+    """Array of 2D vectors backed by a (N, 2) NumPy array.
+    Offers the Vector API on all the vectors at once: properties and
+    methods return arrays of results. Operands can be arrays of the same
+    type or a single vector of type vector_type, applied to all elements.
+    """
+    vector_type = Vector
+
+    def __init__(self, vectors=()):
+        """Build from vectors, (x, y) pairs or a (N, 2) array"""
+        if isinstance(vectors, VectorArray):
+            vectors = vectors.a
+        elif len(vectors) and isinstance(vectors[0], Vector):
+            vectors = [(v.x, v.y) for v in vectors]
+        self.a = np.array(vectors, dtype=float).reshape(-1, 2)
+
+    @classmethod
+    def _new(cls, a):
+        """Fast constructor wrapping a (N, 2) float array, without copying"""
+        va = object.__new__(cls)
+        va.a = a
+        return va
+
+    @property
+    def x(self):
+        return self.a[:, 0]
+
+    @property
+    def y(self):
+        return self.a[:, 1]
+
+    def __len__(self):
+        return len(self.a)
+
+    def __iter__(self):
+        new = self.vector_type._new
+        return (new(x, y) for x, y in self.a.tolist())
+
+    def __getitem__(self, i):
+        """A vector for an integer index, an array otherwise"""
+        if isinstance(i, (int, long, np.integer)):
+            x, y = self.a[i].tolist()
+            return self.vector_type._new(x, y)
+        return self._new(self.a[i])
+
+    def tolist(self):
+        """List of [x, y] pairs"""
+        return self.a.tolist()
+
+    def _operand(self, other):
+        """The other vector(s) as something that broadcasts against self.a"""
+        if type(other) == type(self):
+            return other.a
+        if type(other) == self.vector_type:
+            return np.array((other.x, other.y))
+        raise(TypeError("Incompatible Vector types: %s %s" % (repr(self),
+            repr(other))))
+
+    def __add__(self, other):
+        return self._new(self.a + self._operand(other))
+
+    def __sub__(self, other):
+        return self._new(self.a - self._operand(other))
+
+    def __mul__(self, other):
+        if isinstance(other, (Vector, VectorArray)):
+            # dot products
+            return (self.a * self._operand(other)).sum(axis=1)
+        # scalar, or one scalar per vector
+        return self._new(self.a * np.asarray(other)[..., None])
+
+    def __div__(self, other):
+        return self._new(self.a / np.asarray(other)[..., None])
+
+    __truediv__ = __div__
+
+    def __iadd__(self, other):
+        self.a += self._operand(other)
+        return self
+
+    def __isub__(self, other):
+        self.a -= self._operand(other)
+        return self
+
+    def __imul__(self, other):
+        if isinstance(other, (Vector, VectorArray)):
+            return self * other
+        self.a *= np.asarray(other)[..., None]
+        return self
+
+    @property
+    def modulo(self):
+        return np.hypot(self.a[:, 0], self.a[:, 1])
+
+    @property
+    def angle(self):
+        """Angles in radians, as in Vector.angle"""
+        return np.arctan2(self.a[:, 0], self.a[:, 1]) % (2 * math.pi)
+
+    def distance(self, other):
+        return (self - other).modulo
+
+    def normalized(self, other=None):
+        """Unit vectors. Zero length vectors become NaN"""
+        a = self.a if other is None else self._operand(other) - self.a
+        return self._new(a / np.hypot(a[:, 0], a[:, 1])[:, None])
+
+    def orthogonal(self):
+        """Orthogonal vectors"""
+        return self._new(np.column_stack((self.a[:, 1], -self.a[:, 0])))
+
+    def orthonormal(self, other=None):
+        """Orthogonal vectors of length 1"""
+        v = self if other is None else self._new(self._operand(other) -
+            self.a)
+        return v.orthogonal().normalized()
+
+    def __repr__(self):
+        return "%s %s" % (type(self).__name__, self.a.tolist())
+
+
+class PVectorArray(VectorArray):
+    """Array of 2D vectors, measured in pixels"""
+    vector_type = PVector
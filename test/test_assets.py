@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import wave
+
+import numpy as np
+import pygame
+from nose.tools import with_setup
+
+import starorbit.gloss as gloss
+from starorbit.assets import AssetBundle, build_bundle, load_bundle
+
+tmpdir = None
+
+
+def make_assets():
+    """Write a few small images and a sound in a temporary directory"""
+    global tmpdir
+    tmpdir = tempfile.mkdtemp()
+    for name, size, color in (('a.png', (5, 3), (255, 0, 0, 255)),
+            ('b.png', (4, 4), (0, 255, 0, 128)),
+            ('c.png', (10, 6), (0, 0, 255, 255))):
+        surface = pygame.Surface(size, pygame.SRCALPHA, 32)
+        surface.fill(color)
+        pygame.image.save(surface, os.path.join(tmpdir, name))
+    pygame.mixer.init()
+    freq, size, channels = pygame.mixer.get_init()
+    w = wave.open(os.path.join(tmpdir, 'beep.wav'), 'wb')
+    w.setnchannels(channels)
+    w.setsampwidth(2)
+    w.setframerate(freq)
+    w.writeframes(np.zeros(1000 * channels, dtype=np.int16).tostring())
+    w.close()
+
+def remove_assets():
+    shutil.rmtree(tmpdir)
+
+def path(name):
+    return os.path.join(tmpdir, name)
+
+def build():
+    bundle = path('assets.bundle')
+    missing = build_bundle(bundle, [path('a.png'), path('b.png')],
+        [path('c.png'), path('missing.png')], [path('a.png')],
+        [path('beep.wav')])
+    assert missing == [path('missing.png')]
+    return bundle
+
+@with_setup(make_assets, remove_assets)
+def test_contents():
+    bundle = AssetBundle(build())
+    assert not bundle.is_stale()
+
+    pages, regions = gloss.TextureAtlas.render([path('a.png'),
+        path('b.png')], 1, 4096)
+    page = bundle._index['atlas']['pages'][0]
+    assert page[:2] == list(pages[0][:2])
+    assert bundle._block(*page[2:]).tostring() == pages[0][2]
+    assert bundle._index['atlas']['regions'][path('b.png')] == \
+        list(regions[path('b.png')])
+
+    assert bundle.has_texture(path('c.png'))
+    assert not bundle.has_texture(path('missing.png'))
+    w, h, po2w, po2h, offset, size = bundle._index['textures'][path('c.png')]
+    assert (w, h, po2w, po2h) == (10, 6, 16, 8)
+    data = gloss.Texture.prepare(pygame.image.load(path('c.png')))[0]
+    assert bundle._block(offset, size).tostring() == data
+
+    image = bundle.image(path('a.png'))
+    assert image.get_size() == (5, 3)
+    assert image.get_at((1, 1))[:3] == (255, 0, 0)
+
+    sound = bundle.sound(path('beep.wav'))
+    assert sound.get_raw() == pygame.mixer.Sound(path('beep.wav')).get_raw()
+
+@with_setup(make_assets, remove_assets)
+def test_stale():
+    bundle = build()
+    assert load_bundle(bundle) is not None
+    os.utime(path('b.png'), (0, 0))
+    assert load_bundle(bundle) is None
+    assert load_bundle(path('nothing.bundle')) is None
@@ -0,0 +1,71 @@
+import pygame
+from nose.tools import raises
+from starorbit.gloss import AtlasTexture, TextureAtlas, TextureLevels
+
+
+def overlaps(a, b):
+    (ax, ay, aw, ah), (bx, by, bw, bh) = a, b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+def test_pack():
+    sizes = dict(('img%d' % i, (10 + i * 7 % 50, 5 + i * 13 % 40))
+        for i in range(40))
+    placements, pages = TextureAtlas.pack(sizes, 256, padding=1)
+    assert set(placements) == set(sizes)
+    assert len(pages) == 1
+    width, height = pages[0]
+    rects = []
+    for name, (page, x, y) in placements.items():
+        w, h = sizes[name]
+        assert x >= 1 and y >= 1
+        assert x + w < width and y + h < height
+        # padded rectangles do not overlap
+        rects.append((x - 1, y - 1, w + 1, h + 1))
+    for i, a in enumerate(rects):
+        for b in rects[i + 1:]:
+            assert not overlaps(a, b)
+    # power of two pages
+    assert width & (width - 1) == 0 and height & (height - 1) == 0
+
+def test_pack_pages():
+    sizes = dict(('img%d' % i, (100, 100)) for i in range(5))
+    placements, pages = TextureAtlas.pack(sizes, 256, padding=1)
+    assert pages == [(256, 256), (256, 128)]
+    assert sorted(page for page, x, y in placements.values()) == \
+        [0, 0, 0, 0, 1]
+
+def test_pack_empty():
+    assert TextureAtlas.pack({}, 256) == ({}, [])
+
+@raises(ValueError)
+def test_pack_too_big():
+    TextureAtlas.pack({'big': (256, 10)}, 256, padding=1)
+
+def test_region_uv():
+    region = AtlasTexture(None, 1, 16, 32, 64, 16, 128, 256)
+    assert region.uv == (.125, (256 - 32 - 16) / 256., .625, (256 - 32) / 256.)
+    assert (region.half_width, region.half_height) == (32, 8)
+
+def test_downscale():
+    levels = TextureAtlas.downscale('planet', pygame.Surface((300, 130)))
+    assert [(name, surface.get_size()) for name, surface in levels] == \
+        [('planet@2', (150, 65)), ('planet@4', (75, 32))]
+    assert TextureAtlas.downscale('dot', pygame.Surface((40, 40))) == []
+
+def test_render_lod():
+    pages, regions = TextureAtlas.render([('planet', pygame.Surface((128, 64))),
+        ('dot', pygame.Surface((8, 8)))], 1, 256, ['planet'])
+    assert sorted(regions) == ['dot', 'planet', 'planet@2']
+    assert regions['planet@2'][3:] == (64, 32)
+
+def test_lod():
+    levels = TextureLevels([AtlasTexture(None, 1, 0, 0, size, size, 1024, 1024)
+        for size in (512, 256, 128)])
+    assert levels.width == 512 and len(levels) == 3
+    assert levels.lod(2.) is levels.levels[0]
+    assert levels.lod(.5) is levels.levels[1]
+    # never fewer texels than screen pixels
+    assert levels.lod(.6) is levels.levels[0]
+    assert levels.lod(.01) is levels.levels[2]
+    region = levels.levels[2]
+    assert region.lod(.01) is region
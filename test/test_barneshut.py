@@ -0,0 +1,58 @@
+import numpy as np
+
+from starorbit.physics import G, suns_acceleration
+from starorbit.barneshut import QuadTree, BarnesHutGravity, \
+    barnes_hut_acceleration, direct_acceleration
+import starorbit.starorbit as so
+
+
+def _bodies(n, seed=0):
+    rnd = np.random.RandomState(seed)
+    return rnd.normal(scale=100, size=(n, 2)), rnd.uniform(.1, 1, size=n)
+
+def test_tree_mass():
+    pos, mass = _bodies(300)
+    t = QuadTree(pos, mass)
+    assert np.isclose(t.node_mass[0], mass.sum())
+    assert np.allclose(t.com[0], (pos * mass[:, None]).sum(axis=0) / mass.sum())
+    # every leaf holds a single body, barring coincident ones
+    assert (t.end - t.start)[t.leaf].max() == 1
+
+def test_small_theta_is_exact():
+    pos, mass = _bodies(200)
+    pos[7] = pos[8] # coincident bodies
+    a = barnes_hut_acceleration(pos, mass, theta=1e-6)
+    assert np.allclose(a, direct_acceleration(pos, mass))
+
+def test_accuracy():
+    pos, mass = _bodies(1000)
+    ref = direct_acceleration(pos, mass)
+    a = barnes_hut_acceleration(pos, mass, theta=.5)
+    err = np.sqrt(((a - ref) ** 2).sum(axis=1) / (ref ** 2).sum(axis=1))
+    assert np.median(err) < .02
+
+def test_single_body():
+    a = barnes_hut_acceleration(np.array([[1., 2.]]), np.array([1.]))
+    assert tuple(a[0]) == (0, 0)
+
+def test_gravity_adds_suns():
+    pos, mass = _bodies(50)
+    sun_pos = np.array([[500., 0]])
+    sun_mass = np.array([4.])
+    a = BarnesHutGravity(theta=1e-6).acceleration(pos, mass, sun_pos,
+        sun_mass)
+    suns = suns_acceleration(pos, sun_pos, sun_mass)
+    assert np.allclose(a, suns + direct_acceleration(pos, mass))
+
+def test_ship_does_not_attract():
+    so.game = game = so.HeadlessGame(satellites=1, theta=.5)
+    game.load_content()
+    ship, sat = game._ship, game._satellites[0]
+    sat.gcenter = ship.gcenter + so.GVector(10, 0)
+    sat.gspeed = so.GVector(0, 0)
+    pos = np.array([sat.gcenter.tup])
+    game._step_bodies()
+    dv = np.array(sat.gspeed.tup)
+    expected = suns_acceleration(pos, *game._sun_arrays())[0] * game.speed
+    # a sun mass at 10 units would pull with G * 4 / 100
+    assert np.hypot(*(dv - expected)) < .01 * G * 4 / 100 * game.speed
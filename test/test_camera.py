@@ -0,0 +1,50 @@
+import numpy as np
+from starorbit.camera import Camera
+from starorbit.gloss import LineMesh
+
+
+def test_to_screen():
+    c = Camera((400, 300), zoom=2, target=(10, -10))
+    assert c.to_screen(10, -10) == (400, 300)
+    assert c.to_screen(11, -10) == (402, 300)
+
+def test_to_world_inverse():
+    c = Camera((400, 300), zoom=1.5, target=(-20, 35))
+    x, y = c.to_world(*c.to_screen(3., 7.))
+    assert abs(x - 3) < 1e-9 and abs(y - 7) < 1e-9
+
+def test_arrays():
+    c = Camera((400, 300), zoom=.5, target=(100, 100))
+    points = np.array([(0., 0.), (100., 100.), (-30., 12.)])
+    screen = c.to_screen_array(points)
+    assert screen.tolist() == [list(c.to_screen(*p)) for p in points]
+    assert np.allclose(c.to_world_array(screen), points)
+
+def test_matrix():
+    c = Camera((400, 300), zoom=3, target=(5, 6))
+    x, y, w = c.matrix.dot((7, 8, 1))
+    assert (x, y) == c.to_screen(7, 8)
+
+def test_invalidation():
+    c = Camera((400, 300))
+    v = c.version
+    c.zoom = 1
+    c.target = (0, 0)
+    c.screen_center = (400, 300)
+    assert c.version == v
+    c.zoom = 2
+    assert c.version == v + 1
+    c.target = (1, 0)
+    assert c.version == v + 2
+    assert c.to_screen(1, 0) == (400, 300)
+
+def test_gl_matrix():
+    camera = Camera((400, 300), 2, (10, -5))
+    m = LineMesh.gl_matrix(camera.matrix).reshape(4, 4).T
+    x, y = 3, 7
+    screen = np.dot(m, (x, y, 0, 1))
+    assert np.allclose(screen[:2], camera.to_screen(x, y))
+
+def test_line_mesh_is_uploaded_when_drawn():
+    mesh = LineMesh([(0, 0), (1, 1), (2, 0)])
+    assert mesh.count == 0 and mesh.pending.shape == (3, 2)
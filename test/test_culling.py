@@ -0,0 +1,47 @@
+from collections import namedtuple
+import starorbit.gloss as gloss
+import starorbit.starorbit as so
+
+Texture = namedtuple('Texture', 'width height')
+
+
+def new_game():
+    so.game = so.HeadlessGame(satellites=0, resolution=so.PVector(800, 600))
+    return so.game
+
+def new_sun(x, y):
+    """A sun 50 pixels in radius at zoom 1, at the given screen position"""
+    sun = so.Sun()
+    sun.texture = Texture(3000, 4000)
+    sun._raw_scale = .02
+    sun.position = (x, y)
+    return sun
+
+def test_sprite_bounds():
+    game = new_game()
+    game.zoom = 2
+    assert new_sun(10, 20).screen_bounds() == (-90, -80, 110, 120)
+
+def test_cull_sprites():
+    game = new_game()
+    suns = [new_sun(400, 300), new_sun(-49, 300), new_sun(-51, 300),
+        new_sun(849, 649), new_sun(400, 651)]
+    visible = game._cull(suns)
+    assert visible == suns[:2] + suns[3:4]
+    assert (game.drawn_count, game.culled_count) == (3, 2)
+
+def test_cull_particles():
+    game = new_game()
+    gloss.Gloss.tick_count = 0
+    explosion = so.PSystem()
+    explosion._ps = ps = gloss.ParticleSystem(Texture(30, 40),
+        initialparticles=3, minscale=2, maxscale=2)
+    ps.positions[:] = [(-100, 50), (-80, 40), (-90, 60)]
+    assert explosion.screen_bounds() == (-150, -10, -30, 110)
+    assert not game._on_screen(explosion)
+    ps.positions[0] = (-10, 50)
+    assert game._on_screen(explosion)
+    # finished systems are never drawn
+    ps.positions = ps.positions[:0]
+    assert not game._on_screen(explosion)
+    del gloss.Gloss.auto_particle_systems[:]
@@ -0,0 +1,74 @@
+from nose.tools import raises
+import numpy as np
+
+from starorbit.integrators import get_integrator, energy_drift, \
+    SemiImplicitEuler, Leapfrog, Yoshida4, RK45
+
+
+def _free_fall(integrator, dt, steps):
+    """Constant acceleration: the exact solution is a parabola"""
+    pos = np.array([[0., 0.]])
+    vel = np.array([[1., 0.]])
+    accel = lambda p: np.array([[0., -2.]])
+    for i in xrange(steps):
+        integrator.step(pos, vel, accel, dt)
+    t = dt * steps
+    return pos[0], np.array([t, -t ** 2])
+
+def test_constant_acceleration():
+    # second and higher order integrators are exact here
+    for integrator in (Leapfrog(), Yoshida4(), RK45()):
+        pos, exact = _free_fall(integrator, .5, 10)
+        assert np.allclose(pos, exact), (integrator, pos)
+
+def test_euler_is_first_order():
+    pos, exact = _free_fall(SemiImplicitEuler(), .5, 10)
+    assert not np.allclose(pos, exact)
+    assert np.allclose(pos[0], exact[0])
+
+def test_energy_conservation():
+    euler, _ = energy_drift(SemiImplicitEuler(), 4, orbits=2)
+    leapfrog, _ = energy_drift(Leapfrog(), 4, orbits=2)
+    yoshida, _ = energy_drift(Yoshida4(), 4, orbits=2)
+    assert leapfrog < euler / 10
+    assert yoshida < leapfrog / 10
+
+def test_rk45_adapts():
+    # a strongly eccentric orbit forces substeps near the sun
+    err, calls = energy_drift(RK45(), 4, orbits=1, eccentricity=.9)
+    steps = int(energy_drift(Leapfrog(), 4, orbits=1, eccentricity=.9)[1])
+    assert calls > steps * 7
+    assert err < 1e-3
+
+def test_get_integrator():
+    assert isinstance(get_integrator('verlet'), Leapfrog)
+
+@raises(ValueError)
+def test_get_unknown_integrator():
+    get_integrator('foo')
+
+def test_rk45_out_of_substeps():
+    # harmonic oscillator, with a tolerance no substep can meet
+    integrator = RK45(rtol=1e-15, atol=1e-15, max_substeps=3)
+    pos = np.array([[1., 0.]])
+    vel = np.array([[0., 0.]])
+    integrator.step(pos, vel, lambda p: -p, 1.)
+    assert integrator.exhausted == 1
+    # the whole step is done all the same
+    assert np.allclose(pos, [[np.cos(1), 0]], atol=1e-3)
+    assert np.allclose(vel, [[-np.sin(1), 0]], atol=1e-3)
+
+def test_complex_single_body():
+    # a body as x + yj follows the same path as a one row array
+    accel_array = lambda p: -p / (p * p).sum() ** 1.5
+    accel_complex = lambda p: -p / abs(p) ** 3
+    for integrator in (SemiImplicitEuler(), Leapfrog(), Yoshida4(), RK45()):
+        pos, vel = np.array([[1., 0.]]), np.array([[0., 1.]])
+        p, v = 1 + 0j, 1j
+        for i in xrange(20):
+            integrator.step(pos, vel, accel_array, .1)
+        integrator = type(integrator)()
+        for i in xrange(20):
+            p, v = integrator.step(p, v, accel_complex, .1)
+        assert np.allclose((p.real, p.imag), pos[0], atol=1e-6), integrator
+        assert np.allclose((v.real, v.imag), vel[0], atol=1e-6), integrator
@@ -0,0 +1,71 @@
+import math
+import numpy as np
+
+from starorbit.physics import G, suns_acceleration
+from starorbit.integrators import Yoshida4
+from starorbit.kepler import Conic, predict_orbit
+
+MU = G * 4
+
+
+def _integrate(r, v, dt, steps):
+    """Reference numerical trajectory around a sun at the origin"""
+    pos = np.array([r], dtype=float)
+    vel = np.array([v], dtype=float)
+    accel = lambda p: suns_acceleration(p, np.zeros((1, 2)), np.array([4.]))
+    out = []
+    for i in xrange(steps):
+        Yoshida4().step(pos, vel, accel, dt)
+        out.append(pos[0].copy())
+    return np.array(out)
+
+def _max_distance_from(points, path):
+    """Largest distance of the path from the sampled polyline"""
+    d = np.sqrt(((path[:, None, :] - points[None, :, :]) ** 2).sum(axis=2))
+    return d.min(axis=1).max()
+
+def test_circular():
+    r = 200.
+    c = Conic((r, 0), (0, math.sqrt(MU / r)), MU)
+    assert c.kind == 'ellipse'
+    assert c.e < 1e-9
+    pts = c.sample(100)
+    assert np.allclose(np.sqrt((pts ** 2).sum(axis=1)), r)
+    assert np.allclose(pts[0], (r, 0))
+
+def test_ellipse_matches_integration():
+    for v in ((0, .3), (0, -.3), (.1, .25)):
+        c = Conic((-150, 80), v, MU)
+        assert c.kind == 'ellipse'
+        pts = c.sample(2000)
+        assert np.allclose(pts[0], (-150, 80))
+        path = _integrate((-150, 80), v, .5, int(c.period / .5))
+        # the body moves in the sampling direction
+        assert np.linalg.norm(path[10] - pts[5]) < \
+            np.linalg.norm(path[10] - pts[-5])
+        assert _max_distance_from(pts, path) < 1
+
+def test_hyperbola_matches_integration():
+    c = Conic((200, 0), (.3, .7), MU)
+    assert c.kind == 'hyperbola'
+    pts = c.sample(2000, max_distance=1000)
+    assert np.allclose(pts[0], (200, 0))
+    assert np.sqrt((pts[-1] ** 2).sum()) > 999
+    path = _integrate((200, 0), (.3, .7), .5, 1000)
+    path = path[np.sqrt((path ** 2).sum(axis=1)) < 900]
+    assert _max_distance_from(pts, path) < 1
+
+def test_radial_is_degenerate():
+    assert Conic((100, 0), (-1, 0), MU).kind == 'degenerate'
+
+def test_predict_orbit_fallback():
+    sun_pos = np.array([[0., 0.], [1000., 0.]])
+    sun_mass = np.array([4., 4.])
+    pos, vel = (-200, 0), (0, .3)
+    assert predict_orbit(pos, vel, sun_pos[:1], sun_mass[:1]) is not None
+    # a distant second sun barely perturbs the orbit
+    assert predict_orbit(pos, vel, sun_pos, sun_mass, tolerance=.1) \
+        is not None
+    # a close one does
+    sun_pos[1] = (300, 0)
+    assert predict_orbit(pos, vel, sun_pos, sun_mass) is None
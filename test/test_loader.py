@@ -0,0 +1,31 @@
+from nose.tools import raises
+from starorbit.loader import AssetLoader
+
+
+def test_results():
+    loader = AssetLoader(2)
+    loader.add('a', sum, [1, 2])
+    loader.add('b', lambda: loader.get('a') * 10)
+    assert 'a' in loader and len(loader) == 2
+    results = loader.wait()
+    assert results.keys() == ['a', 'b']
+    assert results.values() == [3, 30]
+
+def test_progress():
+    loader = AssetLoader(2)
+    for i in range(4):
+        loader.add(i, abs, -i)
+    reported = []
+    loader.wait(reported.append)
+    assert reported[-1] == 1.
+    assert reported == sorted(reported)
+    assert loader.progress == 1.
+
+def test_no_jobs():
+    assert AssetLoader(1).wait() == {}
+
+@raises(IOError)
+def test_errors_are_raised():
+    loader = AssetLoader(1)
+    loader.add('missing', open, '/nonexistent/file')
+    loader.wait()
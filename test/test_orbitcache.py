@@ -0,0 +1,31 @@
+import numpy as np
+
+from starorbit.orbitcache import OrbitCache
+
+SUN_POS = np.array([[0., 0.]])
+SUN_MASS = np.array([4.])
+
+
+def test_hit_translates():
+    c = OrbitCache()
+    c.put((100, 0), (0, .3), SUN_POS, SUN_MASS, [(100, 0), (90, 20)])
+    assert c.get((100, 1), (0, .3), SUN_POS, SUN_MASS) is None
+    pts = c.get((100.2, .1), (0, .301), SUN_POS, SUN_MASS)
+    assert np.allclose(pts, [(100.2, .1), (90.2, 20.1)])
+    assert (c.hits, c.misses) == (1, 1)
+
+def test_lru():
+    c = OrbitCache(size=2)
+    for x in (1, 2, 3):
+        c.put((x, 0), (0, 0), SUN_POS, SUN_MASS, [(x, 0)])
+        c.get((1, 0), (0, 0), SUN_POS, SUN_MASS)
+    assert len(c) == 2
+    assert c.get((1, 0), (0, 0), SUN_POS, SUN_MASS) is not None
+    assert c.get((2, 0), (0, 0), SUN_POS, SUN_MASS) is None
+
+def test_invalidate_on_sun_change():
+    c = OrbitCache()
+    c.put((1, 0), (0, 0), SUN_POS, SUN_MASS, [(1, 0)])
+    assert c.get((1, 0), (0, 0), SUN_POS + 1, SUN_MASS) is None
+    assert len(c) == 0
+    assert c.invalidations == 1
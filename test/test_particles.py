@@ -0,0 +1,73 @@
+from nose.tools import with_setup
+import numpy as np
+from starorbit.gloss import Color, Gloss, ParticleSystem, SpriteBatch
+
+
+class FakeTexture(object):
+    surface = 1
+    width = 10
+    height = 20
+    uv = (0, 0, 1, 1)
+
+
+def reset_clock():
+    Gloss.tick_count = 0
+    Gloss.elapsed_seconds = .5
+
+def teardown():
+    del Gloss.auto_particle_systems[:]
+
+@with_setup(reset_clock)
+def test_create():
+    ps = ParticleSystem(FakeTexture, position=(10, 20), initialparticles=30,
+        minspeed=2, maxspeed=3, minscale=.5, maxscale=.6)
+    assert ps.particle_count == 30
+    assert (ps.positions == (10, 20)).all()
+    speed = np.hypot(*ps.velocities.T)
+    assert (speed >= 2).all() and (speed <= 3).all()
+    assert (ps.scales >= .5).all() and (ps.scales <= .6).all()
+
+@with_setup(reset_clock)
+def test_update():
+    ps = ParticleSystem(FakeTexture, initialparticles=1, particlelifespan=1000,
+        wind=(4, 0), drag=1)
+    ps.velocities[:] = (2, 2)
+    Gloss.tick_count = 250
+    assert ps.update()
+    assert np.allclose(ps.positions, (1 + 2, 1))
+    assert np.allclose(ps.velocities, (1, 1))
+    assert np.allclose(ps.anim_pos, .25)
+    assert np.allclose(ps.colors, (1, 1, 1, .75))
+
+@with_setup(reset_clock)
+def test_expiry():
+    ps = ParticleSystem(FakeTexture, initialparticles=2, particlelifespan=100)
+    Gloss.tick_count = 50
+    ps.create_particle()
+    Gloss.tick_count = 101
+    assert ps.update()
+    assert ps.particle_count == 1
+    Gloss.tick_count = 200
+    ps.update()
+    assert ps.particle_count == 0
+    # systems without a lifespan end with their last particle
+    assert ps.update() is False
+
+@with_setup(reset_clock)
+def test_batched_draw():
+    ps = ParticleSystem(FakeTexture, initialparticles=3, growth=2,
+        startcolor=Color(1, 0, 0, 1), endcolor=Color(0, 0, 1, 0))
+    ps.scales[:] = 1
+    ps.anim_pos[:] = .5
+    Gloss.batch = batch = SpriteBatch()
+    try:
+        ps.draw()
+    finally:
+        Gloss.batch = None
+    quads, = batch.groups[(1, False)]
+    assert quads.shape == (3, 15)
+    # size and centered origin, with growth
+    assert np.allclose(quads[:, 3:7], (20, 40, 10, 20))
+    assert np.allclose(quads[:, 7:11], (.5, 0, .5, .5))
+    vertices, texcoords, colors = SpriteBatch.build([quads])
+    assert vertices.shape == (18, 2)
@@ -0,0 +1,96 @@
+from nose.tools import assert_raises, raises
+import numpy as np
+
+from starorbit.physics import G, BodyStore, suns_acceleration
+import starorbit.starorbit as so
+
+
+def test_store_add_remove():
+    b = BodyStore(capacity=2)
+    slots = [b.add((i, 0), (0, 1), 1) for i in xrange(5)]
+    assert slots == range(5)
+    assert len(b) == 5
+    b.remove(2)
+    assert len(b) == 4
+    # freed slots are reused
+    assert b.add((9, 9), (0, 0), 1) == 2
+    assert tuple(b.pos[2]) == (9, 9)
+    assert tuple(b.pos[4]) == (4, 0)
+
+@raises(AssertionError)
+def test_store_double_remove():
+    b = BodyStore()
+    i = b.add((0, 0), (0, 0), 1)
+    b.remove(i)
+    b.remove(i)
+
+def test_suns_acceleration():
+    pos = np.array([[10., 0.], [0., -20.]])
+    acc = suns_acceleration(pos, np.array([[0., 0.]]), np.array([4.]))
+    assert np.allclose(acc[0], (-G * 4 / 100., 0))
+    assert np.allclose(acc[1], (0, G * 4 / 400.))
+
+def test_step():
+    b = BodyStore()
+    i = b.add((100, 0), (0, 1), .001)
+    j = b.add((5, 0), (0, 0), .001)
+    b.remove(j)
+    b.step(np.array([[0., 0.]]), np.array([4.]), dt=2)
+    vx = -G * 4 / 100. ** 2 * 2
+    assert np.allclose(b.vel[i], (vx, 1))
+    assert np.allclose(b.pos[i], (100 + vx * 2, 2))
+    # dead slots do not move
+    assert tuple(b.pos[j]) == (5, 0)
+
+def test_step_collision():
+    b = BodyStore()
+    near = b.add((10, 0), (0, 0), 1)
+    far = b.add((100, 0), (0, 0), 1)
+    b.step(np.array([[0., 0.]]), np.array([.01]))
+    assert b.collided[near]
+    assert not b.collided[far]
+
+def test_step_body_collision():
+    b = BodyStore(body_radius=2)
+    first = b.add((100, 0), (0, 0), 1)
+    second = b.add((103, 0), (0, 0), 1)
+    far = b.add((110, 0), (0, 0), 1)
+    b.remove(far)
+    dead = b.add((100, 200), (0, 0), 1)
+    b.remove(dead)
+    b.step(np.zeros((0, 2)), np.zeros(0))
+    assert b.collided[first] and b.collided[second]
+    assert len(b.grid) == 2
+
+def test_custom_gravity():
+    class NoGravity(object):
+        def acceleration(self, pos, mass, sun_pos, sun_mass):
+            return np.zeros_like(pos)
+
+    b = BodyStore(gravity=NoGravity())
+    i = b.add((10, 0), (1, 0), 1)
+    b.step(np.array([[0., 0.]]), np.array([4.]))
+    assert tuple(b.pos[i]) == (11, 0)
+
+def test_owners():
+    b = BodyStore(capacity=1)
+    first = b.add((0, 0), (0, 0), 1, 'first')
+    second = b.add((1, 0), (0, 0), 1, 'second')
+    assert b.owners[first] == 'first' and b.owners[second] == 'second'
+    b.remove(first)
+    assert b.owners[first] is None
+
+def test_collided_satellites_are_removed():
+    so.game = game = so.HeadlessGame(satellites=6)
+    game.load_content()
+    doomed = game._satellites[1::2]
+    sun = game._suns[0].gcenter
+    for i, s in enumerate(game._satellites):
+        s.gcenter = so.GVector(1000 + 100 * i, 0)
+    for s in doomed:
+        s.gcenter = sun + so.GVector(5, 0)
+        s.gspeed = so.GVector(0, 0)
+    game.tick()
+    assert len(game._satellites) == 3
+    assert not set(doomed) & set(game._satellites)
+    assert len(game._bodies) == 4 # and the ship
@@ -0,0 +1,51 @@
+import math
+import numpy as np
+
+from starorbit.physics import G
+from starorbit.integrators import Leapfrog
+from starorbit.prediction import predict_chunks, OrbitPredictionJob
+
+SUN_POS = np.zeros((1, 2))
+SUN_MASS = np.array([4.])
+
+
+def _circular(r=200.):
+    return (r, 0), (0, math.sqrt(G * 4 / r))
+
+def test_predict_closed_orbit():
+    pos, vel = _circular()
+    chunks = list(predict_chunks(pos, vel, SUN_POS, SUN_MASS, Leapfrog()))
+    points = [p for c in chunks for p in c]
+    assert 11 < len(points) < 500
+    # the orbit closes near the starting point
+    assert math.hypot(points[-1][0] - 200, points[-1][1]) < 6
+    for x, y in points:
+        assert abs(math.hypot(x, y) - 200) < 1
+
+def test_predict_max_points():
+    pos, vel = (200, 0), (0, 1)
+    chunks = list(predict_chunks(pos, vel, SUN_POS, SUN_MASS, Leapfrog(),
+        max_points=50))
+    assert sum(len(c) for c in chunks) == 50
+
+def test_job_streams_points():
+    pos, vel = _circular()
+    job = OrbitPredictionJob(pos, vel, SUN_POS, SUN_MASS, Leapfrog())
+    job.start()
+    job.join(10)
+    chunks = []
+    while True:
+        c = job.points.get(timeout=1)
+        if c is None:
+            break
+        chunks.append(c)
+    assert len(chunks) > 1
+
+def test_job_cancel():
+    pos, vel = _circular()
+    job = OrbitPredictionJob(pos, vel, SUN_POS, SUN_MASS, Leapfrog())
+    job.cancel()
+    job.start()
+    job.join(10)
+    assert not job.is_alive()
+    assert job.points.empty()
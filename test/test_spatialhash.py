@@ -0,0 +1,36 @@
+import numpy as np
+
+from starorbit.spatialhash import SpatialHash
+
+
+def _points(n=500, seed=0):
+    return np.random.RandomState(seed).uniform(-100, 100, size=(n, 2))
+
+def _brute_pairs(pos, radius):
+    d = np.sqrt(((pos[:, None] - pos[None, :]) ** 2).sum(axis=2))
+    i, j = np.nonzero(d < radius)
+    return set((a, b) for a, b in zip(i, j) if a < b)
+
+def test_pairs():
+    pos = _points()
+    h = SpatialHash(cell_size=8)
+    h.build(pos)
+    i, j = h.pairs(8)
+    found = set((min(a, b), max(a, b)) for a, b in zip(i, j))
+    assert len(found) == len(i)
+    assert found == _brute_pairs(pos, 8)
+
+def test_query_radius():
+    pos = _points()
+    h = SpatialHash(cell_size=8)
+    h.build(pos, ids=np.arange(len(pos)) + 1000)
+    for center, r in (((0, 0), 30), ((-99, 50.5), 3), ((500, 500), 10)):
+        d = np.sqrt(((pos - center) ** 2).sum(axis=1))
+        expected = set(np.flatnonzero(d < r) + 1000)
+        assert set(h.query_radius(center, r)) == expected
+
+def test_empty():
+    h = SpatialHash()
+    h.build(np.zeros((0, 2)))
+    assert len(h.query_radius((0, 0), 10)) == 0
+    assert len(h.pairs(5)[0]) == 0
@@ -0,0 +1,72 @@
+import math
+import numpy as np
+from starorbit.gloss import SpriteBatch, Color
+
+
+class FakeTexture(object):
+    surface = 1
+    width = 64
+    height = 32
+    uv = (0, .75, .5, 1)
+
+
+def strip_vertices(position, rotation, origin, scale):
+    """The triangle strip drawn by Texture.draw, transformed as the
+    glTranslatef/glRotatef calls do
+    """
+    t = FakeTexture
+    w, h = t.width * scale, t.height * scale
+    if origin is None:
+        ox, oy = w / 2., h / 2.
+    else:
+        ox, oy = origin[0] * scale, origin[1] * scale
+    corners = [(-ox, h - oy), (w - ox, h - oy), (-ox, -oy), (w - ox, -oy)]
+    u0, v0, u1, v1 = t.uv
+    texcoords = [(u0, v0), (u1, v0), (u0, v1), (u1, v1)]
+    a = math.radians(rotation)
+    c, s = math.cos(a), math.sin(a)
+    vertices = [(position[0] + x * c - y * s, position[1] + x * s + y * c)
+        for x, y in corners]
+    return vertices, texcoords
+
+
+def test_build_matches_immediate_mode():
+    quads = [((10, 20), 0., (0, 0), 1), ((-5, 7), 30., None, .5),
+        ((100, 0), 275., (3, 4), 2)]
+    batch = SpriteBatch()
+    for q in quads:
+        batch.add(FakeTexture, *q, color=Color(.1, .2, .3, .4))
+    key, = batch.order
+    vertices, texcoords, colors = SpriteBatch.build(batch.groups[key])
+    assert vertices.shape == (18, 2)
+
+    for i, q in enumerate(quads):
+        sv, st = strip_vertices(*q)
+        # the two triangles of the strip
+        for j, k in enumerate((0, 1, 2, 2, 1, 3)):
+            assert np.allclose(vertices[i * 6 + j], sv[k], atol=1e-3)
+            assert np.allclose(texcoords[i * 6 + j], st[k])
+    assert np.allclose(colors, (.1, .2, .3, .4))
+
+def test_groups():
+    class Other(FakeTexture):
+        surface = 2
+
+    batch = SpriteBatch()
+    batch.add(FakeTexture, (0, 0))
+    batch.add(Other, (0, 0))
+    batch.add(FakeTexture, (1, 1))
+    batch.add(FakeTexture, (1, 1), additive=True)
+    assert batch.order == [(1, False), (2, False), (1, True)]
+    assert len(batch.groups[(1, False)]) == 2
+
+def test_atlas_regions_share_a_group():
+    class Region(FakeTexture):
+        uv = (.5, 0, 1, .5)
+
+    batch = SpriteBatch()
+    batch.add(FakeTexture, (0, 0))
+    batch.add(Region, (0, 0))
+    key, = batch.order
+    vertices, texcoords, colors = SpriteBatch.build(batch.groups[key])
+    assert np.allclose(texcoords[6:12:5], [(.5, 0), (1, .5)])
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+import numpy as np
+from starorbit.gloss import AtlasTexture, SpriteFont
+
+
+def fake_font():
+    """A SpriteFont with three letters on two atlas pages, without the GL
+    context the constructor needs
+    """
+    font = SpriteFont.__new__(SpriteFont)
+    font.characters = {
+        'A': AtlasTexture(None, 1, 0, 0, 10, 20, 64, 64),
+        'B': AtlasTexture(None, 1, 16, 0, 8, 20, 64, 64),
+        'C': AtlasTexture(None, 2, 0, 0, 12, 20, 64, 64),
+    }
+    font.line_height = 20
+    font.meshes = OrderedDict()
+    font.mesh_hits = font.mesh_misses = 0
+    return font
+
+def test_layout():
+    font = fake_font()
+    mesh = font.build_mesh("AB\nA", scale=2, letterspacing=1)
+    surface, vertices, texcoords = mesh[0]
+    assert surface == 1
+    # three quads, two triangles each
+    assert vertices.shape == (18, 2)
+    corners = [(v[:, 0].min(), v[:, 1].min(), v[:, 0].max(), v[:, 1].max())
+        for v in vertices.reshape(3, 6, 2)]
+    assert corners == [(0, 0, 20, 40), (22, 0, 38, 40), (0, 40, 20, 80)]
+    assert np.allclose(texcoords[:6].min(axis=0), (0, 44 / 64.))
+
+def test_pages():
+    font = fake_font()
+    mesh = font.build_mesh("ACA")
+    assert [(surface, len(vertices)) for surface, vertices, t in mesh] == \
+        [(1, 12), (2, 6)]
+
+def test_mesh_cache():
+    font = fake_font()
+    font.mesh_cache_size = 2
+    first = font.get_mesh("A")
+    assert font.get_mesh("A") is first
+    font.get_mesh("A", scale=2)
+    font.get_mesh("B")
+    assert (font.mesh_hits, font.mesh_misses) == (1, 3)
+    # "A" was the least recently drawn
+    assert list(font.meshes) == [("A", 2, 0, 0), ("B", 1.0, 0, 0)]
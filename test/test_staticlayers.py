@@ -0,0 +1,50 @@
+import starorbit.starorbit as so
+
+
+class FakeTarget(object):
+    def __init__(self):
+        self.positions = []
+
+    def draw(self, position, blend=True):
+        self.positions.append(position)
+
+
+class Layers(so.StaticLayers):
+    """StaticLayers counting renders instead of drawing"""
+    margin = 50
+
+    def _render(self):
+        self._target = self._target or FakeTarget()
+
+
+def new_layers():
+    so.game = so.HeadlessGame(satellites=0, resolution=so.PVector(800, 600))
+    so.game.load_content()
+    so.game.zoom = 2
+    return Layers()
+
+def test_reused_until_changed():
+    layers = new_layers()
+    layers.draw()
+    layers.draw()
+    assert (layers.hits, layers.misses) == (1, 1)
+    so.game.zoom = 3
+    layers.draw()
+    so.game._suns[0].gcenter = so.GVector(10, 0)
+    layers.draw()
+    assert (layers.hits, layers.misses) == (1, 3)
+
+def test_shifted_while_panning():
+    layers = new_layers()
+    layers.draw()
+    target = so.game.camera.target
+    # 10 game units are 20 pixels at zoom 2
+    so.game.camera.target = (target[0] + 10, target[1] - 20)
+    layers.draw()
+    assert (layers.hits, layers.misses) == (1, 1)
+    assert layers._target.positions == [(-50, -50), (-70, -10)]
+    # beyond the margin
+    so.game.camera.target = (target[0] + 30, target[1])
+    layers.draw()
+    assert (layers.hits, layers.misses) == (1, 2)
+    assert layers._target.positions[-1] == (-50, -50)
@@ -0,0 +1,28 @@
+import gc
+from starorbit.gloss import TextureRegistry
+
+
+class FakeTexture(object):
+    def __init__(self, path):
+        self.path = path
+
+
+def test_shared():
+    registry = TextureRegistry(load=FakeTexture)
+    a = registry.get('smoke.tga')
+    assert registry.get('smoke.tga') is a
+    assert registry.get('fire.png') is not a
+    assert (registry.loads, registry.hits) == (2, 1)
+
+def test_unused_textures_are_freed():
+    registry = TextureRegistry(keep=2, load=FakeTexture)
+    in_use = registry.get('a')
+    for path in 'bcd':
+        registry.get(path)
+    gc.collect()
+    # 'b' is neither in use nor among the last two requested
+    assert sorted(registry.textures.keys()) == ['a', 'c', 'd']
+    assert registry.get('a') is in_use
+    registry.clear()
+    gc.collect()
+    assert 'c' not in registry and 'a' in registry
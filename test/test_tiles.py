@@ -0,0 +1,53 @@
+from collections import namedtuple
+import starorbit.starorbit as so
+
+Texture = namedtuple('Texture', 'width height')
+
+
+def new_tiles(tile_size=100):
+    so.game = so.HeadlessGame(satellites=0, resolution=so.PVector(800, 600))
+    tiles = so.Tiles()
+    tiles._basetile.texture = Texture(tile_size, tile_size)
+    return tiles
+
+def covered(tiles, tile_size=100):
+    """Screen area covered by the displayed tiles, in game units"""
+    xs = [gc.x for gc in tiles._tiles.values()]
+    ys = [gc.y for gc in tiles._tiles.values()]
+    half = tile_size / 2.
+    return min(xs) - half, min(ys) - half, max(xs) + half, max(ys) + half
+
+def test_tiles_cover_the_screen():
+    tiles = new_tiles()
+    for target in ((0, 0), (-130, 70), (260, -333), (-49, -51)):
+        so.game.camera.target = target
+        tiles.update()
+        x0, y0 = so.game.camera.to_world(0, 0)
+        x1, y1 = so.game.camera.to_world(800, 600)
+        left, top, right, bottom = covered(tiles)
+        assert left <= x0 and top <= y0 and right >= x1 and bottom >= y1
+        # no tile beyond the screen edges
+        assert left > x0 - 100 and right < x1 + 100
+        assert top > y0 - 100 and bottom < y1 + 100
+
+def test_negative_coordinates():
+    tiles = new_tiles()
+    locate = lambda x, y: tiles._locate_tile(
+        so.SVector(*so.game.camera.to_screen(x, y)))
+    assert locate(-49, 49) == (0, 0)
+    assert locate(-51, 51) == (-1, 1)
+    assert locate(-149, -151) == (-1, -2)
+
+def test_cache_is_bounded():
+    tiles = new_tiles()
+    tiles.cache_size = 10
+    for x in range(0, 5000, 100):
+        so.game.camera.target = (x, 0)
+        tiles.update()
+        assert len(tiles._tiles) <= 9 * 7
+        assert len(tiles._cache) <= 10
+    created = tiles.created
+    # flying back reuses the recently cached tiles
+    so.game.camera.target = (4800, 0)
+    tiles.update()
+    assert tiles.created == created
@@ -67,3 +67,43 @@ def test_degrees_per_sec():
     d = degrees_per_sec(2) * seconds(3)
     assert isinstance(d, degrees)
 
+
+
+def test_checked():
+    assert CHECKED
+
+def test_conversions():
+    r = to_radians(degrees(180))
+    assert isinstance(r, radians)
+    assert 3.14 < r < 3.15
+    d = to_degrees(radians(r))
+    assert isinstance(d, degrees)
+    assert abs(float(d) - 180) < 1e-9
+
+def test_conversions_from_floats():
+    assert abs(float(to_radians(90.)) - 1.5708) < 1e-4
+    assert abs(float(to_degrees(1.5708)) - 90) < 1e-3
+
+def test_opposite():
+    assert opposite(degrees(270)) == 90
+    assert opposite(10.) == 190
+    assert isinstance(opposite(10.), degrees)
+
+def test_ship_angle_wraps_with_float_units():
+    # units are plain floats in optimized runs
+    import starorbit.starorbit as so
+    saved = so.degrees, so.degrees_per_sec, so.seconds, so.RCSThruster
+    so.degrees = so.degrees_per_sec = so.seconds = float
+    so.RCSThruster = lambda ship, cw: None
+    try:
+        so.game = so.HeadlessGame(satellites=0)
+        so.game.load_content()
+        ship = so.game._ship
+        for angle, av in ((359., 5.), (1., -5.)):
+            ship._angle, ship._angular_velocity = angle, av
+            ship._target_angle = 180.
+            ship._rotate()
+            assert 0 <= ship._angle < 360
+            assert abs(ship._angle - (angle + av) % 360) < 1e-9
+    finally:
+        so.degrees, so.degrees_per_sec, so.seconds, so.RCSThruster = saved
@@ -0,0 +1,109 @@
+from nose.tools import assert_raises, raises
+import numpy as np
+from starorbit.vectors import Vector, PVector, VectorArray, PVectorArray
+
+
+def test_constructors():
+    assert Vector(1, 2).tup == (1, 2)
+    assert Vector((1, 2)).tup == (1, 2)
+    assert Vector(Vector(1, 2)).tup == (1, 2)
+    assert type(PVector._new(1, 2)) is PVector
+
+@raises(AssertionError)
+def test_missing_y():
+    Vector(1)
+
+def test_slots():
+    assert not hasattr(Vector(1, 2), '__dict__')
+    assert not hasattr(PVector(1, 2), '__dict__')
+
+def test_arithmetic():
+    a = PVector(3, 4)
+    b = PVector(1, 1)
+    assert type(a + b) is PVector
+    assert (a + b).tup == (4, 5)
+    assert (a - b).tup == (2, 3)
+    assert (a * 2).tup == (6, 8)
+    assert a * b == 7
+    assert (a / 2.).tup == (1.5, 2)
+
+def test_incompatible_types():
+    assert_raises(TypeError, lambda: Vector(1, 1) + PVector(1, 1))
+    assert_raises(TypeError, lambda: Vector(1, 1) - PVector(1, 1))
+
+def test_inplace():
+    a = PVector(3, 4)
+    alias = a
+    a += PVector(1, 1)
+    a -= PVector(2, 0)
+    a *= 2
+    assert a is alias
+    assert a.tup == (4, 10)
+
+def test_inplace_dot_product():
+    a = Vector(3, 4)
+    a *= Vector(1, 1)
+    assert a == 7
+
+def test_tup_setter():
+    a = Vector(0, 0)
+    a.tup = (1, 2)
+    assert (a.x, a.y) == (1, 2)
+    assert a[1] == 2
+    assert len(a) == 2
+
+def test_modulo_setter():
+    a = Vector(3, 4)
+    a.modulo = 10
+    assert abs(a.x - 6) < 1e-9 and abs(a.y - 8) < 1e-9
+
+
+def test_array_constructors():
+    from_vectors = VectorArray([Vector(1, 2), Vector(3, 4)])
+    from_pairs = VectorArray([(1, 2), (3, 4)])
+    assert from_vectors.tolist() == from_pairs.tolist() == [[1, 2], [3, 4]]
+    assert len(VectorArray()) == 0
+
+def test_array_items():
+    va = PVectorArray([(1, 2), (3, 4), (5, 6)])
+    assert type(va[1]) is PVector and va[1].tup == (3, 4)
+    assert type(va[1:]) is PVectorArray and len(va[1:]) == 2
+    assert [v.tup for v in va] == [(1, 2), (3, 4), (5, 6)]
+
+def test_array_arithmetic():
+    va = PVectorArray([(1, 2), (3, 4)])
+    assert (va + PVector(1, 1)).tolist() == [[2, 3], [4, 5]]
+    assert (va - va).tolist() == [[0, 0], [0, 0]]
+    assert (va * 2).tolist() == [[2, 4], [6, 8]]
+    assert (va * np.array([1, 2])).tolist() == [[1, 2], [6, 8]]
+    assert (va / 2).tolist() == [[.5, 1], [1.5, 2]]
+    assert list(va * PVector(1, 1)) == [3, 7]
+
+def test_array_incompatible_types():
+    va = PVectorArray([(1, 2)])
+    assert_raises(TypeError, lambda: va + Vector(1, 1))
+    assert_raises(TypeError, lambda: va + VectorArray([(1, 2)]))
+
+def test_array_inplace():
+    va = PVectorArray([(1, 2), (3, 4)])
+    alias = va
+    va += PVector(1, 1)
+    va *= 2
+    assert va is alias
+    assert va.tolist() == [[4, 6], [8, 10]]
+
+def test_array_matches_vector():
+    points = [(3, 4), (-1, 2), (0, -5), (-2, -2)]
+    va = VectorArray(points)
+    center = Vector(1, 1)
+    for i, p in enumerate(points):
+        v = Vector(p)
+        assert abs(va.modulo[i] - v.modulo) < 1e-9
+        assert abs(va.angle[i] - v.angle) < 1e-9
+        assert abs(va.distance(center)[i] - v.distance(center)) < 1e-9
+        assert np.allclose(va.normalized()[i].tup, v.normalized().tup)
+        assert np.allclose(va.normalized(center)[i].tup,
+            v.normalized(center).tup)
+        assert va.orthogonal()[i].tup == v.orthogonal().tup
+        assert np.allclose(va.orthonormal(center)[i].tup,
+            v.orthonormal(center).tup)